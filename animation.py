@@ -0,0 +1,63 @@
+from variables import *
+
+
+class AnimationTable:
+    def __init__(self, stand_textures, walk_textures, texture_change_distance: float = 20):
+        # Both keyed by FACE_* state; stand holds one texture, walk the frames in order
+        self.stand = {state: texture for state, texture in stand_textures.items() if texture is not None}
+        self.walk = {state: tuple(textures) for state, textures in walk_textures.items() if textures}
+        self.texture_change_distance = texture_change_distance
+        self.change_distance_squared = texture_change_distance ** 2
+
+    def frame_count(self, state):
+        return len(self.walk.get(state, ()))
+
+    def update(self, sprite):
+        change_x = sprite.change_x
+        change_y = sprite.change_y
+        if change_x == 0 and change_y == 0:
+            texture = self.stand.get(sprite.state)
+            if texture is not None:
+                sprite.texture = texture
+            return
+
+        state = direction(change_x, change_y)
+        if state is not None and state != sprite.state and state in self.walk:
+            sprite.state = state
+        else:
+            dx = sprite.center_x - sprite.last_texture_change_center_x
+            dy = sprite.center_y - sprite.last_texture_change_center_y
+            if dx * dx + dy * dy < self.change_distance_squared:
+                return
+
+        textures = self.walk.get(sprite.state)
+        if not textures:
+            raise RuntimeError(f"update_animation was called on a sprite that doesn't have walk textures "
+                               f"for state {sprite.state}.")
+        sprite.last_texture_change_center_x = sprite.center_x
+        sprite.last_texture_change_center_y = sprite.center_y
+        sprite.cur_texture_index = (sprite.cur_texture_index + 1) % len(textures)
+        sprite.texture = textures[sprite.cur_texture_index]
+
+
+def direction(change_x, change_y):
+    # Walking sideways or moving straight up or down picks a facing; anything diagonal keeps the current one
+    if change_y == 0:
+        return FACE_RIGHT if change_x > 0 else FACE_LEFT
+    if change_x == 0:
+        return FACE_DOWN if change_y < 0 else FACE_UP
+    return None
+
+
+def animation_table(sprite):
+    walk_up = sprite.walk_up_textures
+    walk_down = sprite.walk_down_textures
+    return AnimationTable({FACE_RIGHT: sprite.stand_right_textures[0] if sprite.stand_right_textures else None,
+                           FACE_LEFT: sprite.stand_left_textures[0] if sprite.stand_left_textures else None,
+                           FACE_UP: walk_up[0] if walk_up else None,
+                           FACE_DOWN: walk_down[0] if walk_down else None},
+                          {FACE_RIGHT: sprite.walk_right_textures,
+                           FACE_LEFT: sprite.walk_left_textures,
+                           FACE_UP: walk_up,
+                           FACE_DOWN: walk_down},
+                          sprite.texture_change_distance)
@@ -0,0 +1,208 @@
+import glob
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+from variables import *
+
+HEADER_FORMAT = "<4sI"
+
+
+def asset_key(file_name):
+    return os.path.normpath(file_name).replace(os.sep, "/")
+
+
+class PackedFile(io.RawIOBase):
+    # A read-only file over one entry of the pack. Nothing is read up front; each read copies just the
+    # bytes asked for out of the mapping, and readinto copies them straight into the caller's buffer
+    def __init__(self, view, offset, size):
+        super().__init__()
+        self.view = view
+        self.start = offset
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = min(max(offset, 0), self.size)
+        return self.position
+
+    def span(self, size):
+        if size is None or size < 0:
+            size = self.size - self.position
+        start = self.start + self.position
+        end = self.start + min(self.position + size, self.size)
+        self.position = end - self.start
+        return start, end
+
+    def read(self, size=-1):
+        start, end = self.span(size)
+        return self.view[start:end]
+
+    def readinto(self, buffer):
+        start, end = self.span(len(buffer))
+        with memoryview(self.view) as view:
+            buffer[:end - start] = view[start:end]
+        return end - start
+
+
+class AssetPack:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = struct.unpack_from(HEADER_FORMAT, self.map)
+        if magic != ASSET_PACK_MAGIC:
+            raise ValueError(f"{file_name} is not an asset pack")
+        header_start = struct.calcsize(HEADER_FORMAT)
+        header = json.loads(bytes(self.map[header_start:header_start + header_size]))
+        data_start = header_start + header_size
+        self.entries = {name: (data_start + offset, size) for name, (offset, size, _) in header["files"].items()}
+        self.sources = {name: (size, mtime) for name, (_, size, mtime) in header["files"].items()}
+        self.stale = {}
+        self.loose_directories = {}
+
+    def has_loose_files(self, name):
+        # Installs that only ship the pack have no images/ or sounds/ beside it, so one check per top
+        # level directory settles it and no asset is ever looked up on its own
+        directory = name.split("/", 1)[0] if "/" in name else ""
+        loose = self.loose_directories.get(directory)
+        if loose is None:
+            loose = self.loose_directories[directory] = directory == "" or os.path.isdir(directory)
+        return loose
+
+    def is_stale(self, name):
+        # During development a loose file that changed since the pack was built wins over the packed copy
+        stale = self.stale.get(name)
+        if stale is None:
+            if not self.has_loose_files(name):
+                self.stale[name] = False
+                return False
+            try:
+                stat = os.stat(name)
+                stale = (stat.st_size, stat.st_mtime_ns) != self.sources[name]
+            except OSError:
+                stale = False
+            if stale:
+                print(f"{name} changed since {self.file_name} was built, using the loose file.")
+            self.stale[name] = stale
+        return stale
+
+    def __contains__(self, file_name):
+        name = asset_key(file_name)
+        return name in self.entries and not self.is_stale(name)
+
+    def open(self, file_name):
+        name = asset_key(file_name)
+        entry = self.entries.get(name)
+        if entry is None or self.is_stale(name):
+            return None
+        return PackedFile(self.map, *entry)
+
+    def close(self):
+        self.map.close()
+
+
+def build_pack(file_name, sources):
+    names = sorted({asset_key(source) for source in sources})
+    files = {}
+    offset = 0
+    for name in names:
+        stat = os.stat(name)
+        files[name] = (offset, stat.st_size, stat.st_mtime_ns)
+        offset += stat.st_size
+    header = json.dumps({"files": files}).encode()
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, "wb") as pack:
+        pack.write(struct.pack(HEADER_FORMAT, ASSET_PACK_MAGIC, len(header)))
+        pack.write(header)
+        for name in names:
+            with open(name, "rb") as source:
+                pack.write(source.read())
+    os.replace(temp_file_name, file_name)
+    return len(names), offset
+
+
+pack = None
+pack_lock = threading.Lock()
+pack_checked = False
+
+
+def get_pack():
+    # Opened on first use; no pack file just means loose files, as during development
+    global pack, pack_checked
+    if not pack_checked:
+        with pack_lock:
+            if not pack_checked:
+                if os.path.exists(ASSET_PACK_FILE_NAME):
+                    try:
+                        pack = AssetPack(ASSET_PACK_FILE_NAME)
+                    except (OSError, ValueError) as e:
+                        print(f"Unable to open asset pack {ASSET_PACK_FILE_NAME}.", e)
+                pack_checked = True
+    return pack
+
+
+def open_asset(file_name):
+    asset_pack = get_pack()
+    if asset_pack is not None:
+        packed = asset_pack.open(file_name)
+        if packed is not None:
+            return packed
+    return open(file_name, "rb")
+
+
+def is_packed(file_name):
+    asset_pack = get_pack()
+    return asset_pack is not None and file_name in asset_pack
+
+
+def load_media(file_name, streaming=False):
+    import pyglet
+    if is_packed(file_name):
+        try:
+            return pyglet.media.load(file_name, file=open_asset(file_name), streaming=streaming)
+        except Exception:
+            # Some decoders only take a path; the loose file still works if it is there
+            if not os.path.exists(file_name):
+                raise
+    return pyglet.media.load(file_name, streaming=streaming)
+
+
+def tile_sources():
+    from level_cache import load_map
+    sources = set()
+    level = 1
+    while os.path.exists(f"map2_level_{level}.tmx"):
+        compiled = load_map(f"map2_level_{level}.tmx", TILE_SCALING)
+        sources.update(tile.source for tile in compiled.global_tile_set.values())
+        level += 1
+    return sources
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sources = set(tile_sources())
+    for pattern in ASSET_PACK_SOURCES:
+        sources.update(glob.glob(pattern, recursive=True))
+    sources = [source for source in sources if os.path.isfile(source)]
+    count, size = build_pack(ASSET_PACK_FILE_NAME, sources)
+    print(f"Packed {count} files ({size / 1e6:.1f} MB) into {ASSET_PACK_FILE_NAME}")
+
+
+if __name__ == '__main__':
+    main()
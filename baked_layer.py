@@ -0,0 +1,68 @@
+import math
+import arcade
+import PIL.Image
+from variables import *
+
+
+class BakedRegion:
+    def __init__(self, left, bottom, texture):
+        self.left = left
+        self.bottom = bottom
+        self.texture = texture
+        self.center_x = left + texture.width / 2
+        self.center_y = bottom + texture.height / 2
+
+
+class BakedLayer:
+    def __init__(self, name, sprite_list, region_width: float = CHUNK_WIDTH):
+        self.name = name
+        self.region_width = region_width
+        self.regions = {}
+        self.sprite_count = len(sprite_list)
+        self.draw_calls = 0
+        regions = {}
+        for sprite in sprite_list:
+            regions.setdefault(math.floor(sprite.left / region_width), []).append(sprite)
+        scaled_images = {}
+        for key, sprites in regions.items():
+            self.regions[key] = self.bake_region(key, sprites, scaled_images)
+        self.max_width = max((region.texture.width for region in self.regions.values()), default=0)
+
+    def bake_region(self, key, sprites, scaled_images):
+        left = math.floor(min(sprite.left for sprite in sprites))
+        bottom = math.floor(min(sprite.bottom for sprite in sprites))
+        right = math.ceil(max(sprite.right for sprite in sprites))
+        top = math.ceil(max(sprite.top for sprite in sprites))
+        image = PIL.Image.new("RGBA", (right - left, top - bottom))
+        for sprite in sprites:
+            size = (round(sprite.width), round(sprite.height))
+            tile_key = (sprite.texture.name, size)
+            tile_image = scaled_images.get(tile_key)
+            if tile_image is None:
+                tile_image = sprite.texture.image.convert("RGBA").resize(size, resample=PIL.Image.LANCZOS)
+                scaled_images[tile_key] = tile_image
+            # Image rows run down from the top, arcade's y runs up from the bottom
+            image.alpha_composite(tile_image, (round(sprite.left) - left, top - round(sprite.top)))
+        return BakedRegion(left, bottom, arcade.Texture(f"baked {self.name} {id(self)} {key}", image))
+
+    def visible_regions(self, view_left, view_right):
+        first = math.floor((view_left - self.max_width) / self.region_width)
+        last = math.floor(view_right / self.region_width)
+        return [self.regions[key] for key in range(first, last + 1) if key in self.regions]
+
+    def draw(self, view_left, view_right):
+        regions = self.visible_regions(view_left, view_right)
+        for region in regions:
+            arcade.draw_texture_rectangle(region.center_x, region.center_y,
+                                          region.texture.width, region.texture.height, region.texture)
+        self.draw_calls = len(regions)
+
+    def __len__(self):
+        return self.sprite_count
+
+
+def bake_static_layers(level):
+    # Only the layers nothing is ever added to or removed from; the sprite lists stay for collisions
+    level.background_chunks = BakedLayer(f"{level.number} background", level.background_list)
+    level.wall_chunks = BakedLayer(f"{level.number} platforms", level.wall_list)
+    level.foreground_chunks = BakedLayer(f"{level.number} foreground", level.foreground_list)
@@ -0,0 +1,223 @@
+import argparse
+import copy
+import json
+import os
+import resource
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+from simulation import World
+from texture_cache import texture_cache, set_headless
+from baked_layer import bake_static_layers
+from level_loader import LoadedLevel, read_map, generate_level, map_file_name
+from commands import *
+from variables import *
+
+
+class BenchmarkLevelLoader:
+    # Loads synchronously so a level's load time isn't hidden behind a prefetch
+    def __init__(self, scale=1, bake=False):
+        self.scale = scale
+        self.bake = bake
+        self.bake_time = 0
+
+    def prefetch(self, number):
+        pass
+
+    def take(self, number):
+        level = LoadedLevel(number)
+        level.my_map = scale_map(read_map(level), self.scale)
+        generate_level(level)
+        if self.bake and level.stream is None:
+            start_time = timeit.default_timer()
+            bake_static_layers(level)
+            self.bake_time = timeit.default_timer() - start_time
+        return level
+
+
+def scale_map(compiled, scale):
+    # Repeats the map side by side, so a scaled level has proportionally more tiles, coins and zombies
+    if scale == 1:
+        return compiled
+    scaled = copy.copy(compiled)
+    scaled.width = compiled.width * scale
+    scaled.layers_int_data = {name: np.tile(grid, (1, scale))
+                              for name, grid in compiled.layers_int_data.items()}
+    scaled.tiles = {}
+    for name, (cols, rows, gids) in compiled.tiles.items():
+        offsets = np.repeat(np.arange(scale, dtype=np.uint32) * compiled.width, len(cols))
+        scaled.tiles[name] = (np.tile(cols.astype(np.uint32), scale) + offsets,
+                              np.tile(rows, scale), np.tile(gids, scale))
+    return scaled
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    samples = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]).tolist()
+    return {"p50": p50, "p95": p95, "p99": p99, "max": float(samples.max())}
+
+
+def sprite_counts(world):
+    return {"walls": len(world.wall_list),
+            "coins": len(world.coin_list),
+            "dont_touch": len(world.dont_touch_list),
+            "foreground": len(world.foreground_list),
+            "background": len(world.background_list),
+            "enemies": len(world.enemy_list),
+            "flags": len(world.flag_list)}
+
+
+class Renderer:
+    def __init__(self):
+        import arcade
+        import pyglet
+        self.arcade = arcade
+        self.gl = pyglet.gl
+        self.window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, "Kayzee benchmark")
+        self.draw_calls = 0
+
+    def draw(self, world):
+        arcade = self.arcade
+        arcade.set_viewport(world.view_left, world.view_left + SCREEN_WIDTH,
+                            world.view_bottom, world.view_bottom + SCREEN_HEIGHT)
+        arcade.start_render()
+        view_right = world.view_left + SCREEN_WIDTH
+        world.background_chunks.draw(world.view_left, view_right)
+        world.wall_chunks.draw(world.view_left, view_right)
+        world.coin_chunks.draw(world.view_left, view_right)
+        world.dont_touch_chunks.draw(world.view_left, view_right)
+        world.enemy_list.draw()
+        world.bullet_list.draw()
+        world.player_list.draw()
+        world.foreground_chunks.draw(world.view_left, view_right)
+        layers = (world.background_chunks, world.wall_chunks, world.coin_chunks,
+                  world.dont_touch_chunks, world.foreground_chunks)
+        # Enemies, bullets and the player are one call each
+        self.draw_calls = sum(layer.draw_calls for layer in layers) + 3
+        # Wait for the GPU so the sample covers the whole draw, not just queuing it
+        self.gl.glFinish()
+        self.window.flip()
+
+    def close(self):
+        self.window.close()
+
+
+def load_peak_bytes(level, scale, bake):
+    import arcade
+    # A load of its own, since tracing every allocation would make the timed load several times slower.
+    # Both texture caches, ours and arcade.load_texture's, are put back afterwards, so the timed load starts
+    # out just as cold
+    textures, hits, misses = dict(texture_cache.textures), texture_cache.hits, texture_cache.misses
+    arcade_textures = dict(arcade.load_texture.texture_cache)
+    world = World(BenchmarkLevelLoader(scale, bake))
+    tracemalloc.start()
+    world.setup(level)
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    texture_cache.textures, texture_cache.hits, texture_cache.misses = textures, hits, misses
+    arcade.load_texture.texture_cache = arcade_textures
+    return load_peak
+
+
+def run_level(level, scale, frames, renderer=None, bake=False):
+    load_peak = load_peak_bytes(level, scale, bake)
+    level_loader = BenchmarkLevelLoader(scale, bake)
+    world = World(level_loader)
+    start_time = timeit.default_timer()
+    world.setup(level)
+    load_time = timeit.default_timer() - start_time
+    counts = sprite_counts(world)
+
+    walk_right = WalkRightCommand()
+    jump = JumpCommand()
+    shoot = ShootCommand()
+    world.execute(walk_right)
+    update_times = []
+    draw_times = []
+    draw_calls = []
+    for frame in range(frames):
+        if frame % 30 == 0:
+            world.execute(jump)
+        if frame % 20 == 0:
+            world.execute(shoot)
+        start_time = timeit.default_timer()
+        world.step()
+        update_times.append(timeit.default_timer() - start_time)
+        world.drain_events()
+        # Reaching the end of the map loads the next level, which belongs to that level's run
+        if world.completed or world.level != level:
+            break
+        if renderer is not None:
+            start_time = timeit.default_timer()
+            renderer.draw(world)
+            draw_times.append(timeit.default_timer() - start_time)
+            draw_calls.append(renderer.draw_calls)
+
+    return {"level": level,
+            "scale": scale,
+            "frames": len(update_times),
+            "load_ms": load_time * 1000,
+            "baked": bake,
+            "bake_ms": level_loader.bake_time * 1000,
+            "load_peak_bytes": load_peak,
+            "update_ms": percentiles(update_times),
+            "draw_ms": percentiles(draw_times) if renderer is not None else None,
+            "draw_calls": float(np.mean(draw_calls)) if draw_calls else None,
+            "sprites": counts}
+
+
+def level_numbers():
+    level = 1
+    while os.path.exists(map_file_name(level)):
+        yield level
+        level += 1
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Benchmark a scripted run through every level.")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4],
+                        help="also run each level repeated side by side this many times")
+    parser.add_argument("--levels", type=int, nargs="+", default=None)
+    parser.add_argument("--draw", action="store_true", help="open a window and time drawing too")
+    parser.add_argument("--bake", action="store_true",
+                        help="bake the static layers into region images, as the game does by default")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    renderer = None
+    if args.draw:
+        renderer = Renderer()
+    elif not args.bake:
+        # Baking needs the real tile images
+        set_headless()
+
+    levels = args.levels or list(level_numbers())
+    runs = []
+    for scale in args.scales:
+        for level in levels:
+            run = run_level(level, scale, args.frames, renderer, args.bake)
+            runs.append(run)
+            print(f"level {level} x{scale}: load {run['load_ms']:.1f}ms, "
+                  f"update p50 {run['update_ms']['p50']:.3f}ms p99 {run['update_ms']['p99']:.3f}ms")
+    if renderer is not None:
+        renderer.close()
+
+    report = {"python": sys.version.split()[0],
+              "frames": args.frames,
+              "headless": renderer is None,
+              "baked": args.bake,
+              "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              "texture_cache": texture_cache.stats(),
+              "runs": runs}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
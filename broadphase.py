@@ -0,0 +1,53 @@
+import bisect
+import arcade
+
+
+def overlaps_y(sprite1, sprite2):
+    return sprite1.bottom <= sprite2.top and sprite2.bottom <= sprite1.top
+
+
+class SweepAndPrune:
+    def __init__(self):
+        self.entries = []
+        self.lefts = []
+        self.max_width = 0
+
+    def build(self, sprite_list):
+        # Sorted along x once per frame, keeping each sprite's list position for stable results
+        self.entries = sorted(((sprite.left, sprite.right, index, sprite)
+                               for index, sprite in enumerate(sprite_list)),
+                              key=lambda entry: entry[0])
+        self.lefts = [entry[0] for entry in self.entries]
+        self.max_width = max((right - left for left, right, _, _ in self.entries), default=0)
+
+    def query(self, sprite):
+        left = sprite.left
+        right = sprite.right
+        start = bisect.bisect_left(self.lefts, left - self.max_width)
+        end = bisect.bisect_right(self.lefts, right)
+        hits = [(index, other) for other_left, other_right, index, other in self.entries[start:end]
+                if other_right >= left and other is not sprite
+                and overlaps_y(sprite, other) and arcade.check_for_collision(sprite, other)]
+        hits.sort(key=lambda hit: hit[0])
+        return [other for _, other in hits]
+
+    def pairs(self, sprite_list):
+        queries = sorted(((sprite.left, sprite.right, index, sprite)
+                          for index, sprite in enumerate(sprite_list)),
+                         key=lambda entry: entry[0])
+        entries = self.entries
+        active = []
+        next_entry = 0
+        pairs = []
+        for left, right, index, sprite in queries:
+            # Bring in everything that starts before this query ends and drop what ended before it starts
+            while next_entry < len(entries) and entries[next_entry][0] <= right:
+                active.append(entries[next_entry])
+                next_entry += 1
+            active = [entry for entry in active if entry[1] >= left]
+            for other_left, other_right, other_index, other in active:
+                if other_left <= right and other is not sprite \
+                        and overlaps_y(sprite, other) and arcade.check_for_collision(sprite, other):
+                    pairs.append((index, other_index, sprite, other))
+        pairs.sort(key=lambda pair: (pair[0], pair[1]))
+        return [(sprite, other) for _, _, sprite, other in pairs]
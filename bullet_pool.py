@@ -0,0 +1,54 @@
+import arcade
+from texture_cache import load_texture
+from variables import *
+
+
+class BulletPool:
+    def __init__(self, capacity: int = BULLET_POOL_CAPACITY):
+        self.capacity = capacity
+        self.bullet_list = arcade.SpriteList()
+        self.free_bullets = [self.make_bullet() for _ in range(capacity)]
+
+    def make_bullet(self):
+        bullet = arcade.Sprite(scale=BULLET_SCALE)
+        bullet.texture = load_texture(BULLET_IMAGE, BULLET_SCALE)
+        bullet.age = 0
+        return bullet
+
+    def acquire(self):
+        if self.free_bullets:
+            bullet = self.free_bullets.pop()
+        else:
+            # Pool exhausted, so the oldest bullet in flight is recycled
+            bullet = self.bullet_list[0]
+            bullet.kill()
+        bullet.age = 0
+        bullet.change_y = 0
+        self.bullet_list.append(bullet)
+        return bullet
+
+    def release(self, bullet):
+        bullet.kill()
+        self.free_bullets.append(bullet)
+
+    def update(self, view_left: float, view_right: float):
+        self.bullet_list.update()
+        expired = []
+        for bullet in self.bullet_list:
+            bullet.age += 1
+            if bullet.age > BULLET_LIFETIME or bullet.right < view_left or bullet.left > view_right:
+                expired.append(bullet)
+        for bullet in expired:
+            self.release(bullet)
+
+    def clear(self):
+        for bullet in list(self.bullet_list):
+            self.release(bullet)
+
+    @property
+    def live_count(self):
+        return len(self.bullet_list)
+
+    @property
+    def pooled_count(self):
+        return len(self.free_bullets)
@@ -0,0 +1,44 @@
+import math
+import arcade
+from variables import *
+
+
+class ChunkedLayer:
+    def __init__(self, sprite_list, chunk_width: float = CHUNK_WIDTH):
+        self.chunk_width = chunk_width
+        self.chunks = {}
+        self.max_width = 0
+        self.draw_calls = 0
+        for sprite in sprite_list:
+            self.add(sprite)
+
+    def chunk_key(self, x):
+        return math.floor(x / self.chunk_width)
+
+    def add(self, sprite):
+        # Chunked by left edge; visible_chunks widens its range to catch sprites reaching in from the left
+        key = self.chunk_key(sprite.left)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = arcade.SpriteList(use_spatial_hash=False, is_static=True)
+        chunk.append(sprite)
+        self.max_width = max(self.max_width, sprite.width)
+
+    def prune(self):
+        # Sprites leave their chunk through Sprite.kill; this drops the chunks left empty
+        for key in [key for key, chunk in self.chunks.items() if not len(chunk)]:
+            del self.chunks[key]
+
+    def visible_chunks(self, view_left, view_right):
+        first = self.chunk_key(view_left - self.max_width)
+        last = self.chunk_key(view_right)
+        return [self.chunks[key] for key in range(first, last + 1) if key in self.chunks]
+
+    def draw(self, view_left, view_right):
+        chunks = self.visible_chunks(view_left, view_right)
+        for chunk in chunks:
+            chunk.draw()
+        self.draw_calls = len(chunks)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks.values())
@@ -1,28 +1,45 @@
 class Command:
+    code = 0
+
     def execute(self):
         pass
 
 
 class JumpCommand(Command):
+    code = 1
+
     def execute(self, actor):
         actor.jump()
 
 
 class ShootCommand(Command):
+    code = 2
+
     def execute(self, actor):
         actor.shoot_bullet()
 
 
 class WalkLeftCommand(Command):
+    code = 3
+
     def execute(self, actor):
         actor.walk_left()
 
 
 class WalkRightCommand(Command):
+    code = 4
+
     def execute(self, actor):
         actor.walk_right()
 
 
 class StopWalkingCommand(Command):
+    code = 5
+
     def execute(self, actor):
         actor.stop_walking()
+
+
+COMMAND_TYPES = {command_type.code: command_type
+                 for command_type in (JumpCommand, ShootCommand, WalkLeftCommand,
+                                      WalkRightCommand, StopWalkingCommand)}
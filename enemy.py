@@ -1,5 +1,7 @@
-import arcade
-from arcade.sprite import *
+from arcade import Sprite
+from animation import animation_table
+from texture_cache import load_frames
+from variables import *
 
 
 class Enemy(Sprite):
@@ -19,79 +21,39 @@ class Enemy(Sprite):
         self.texture_change_distance = 20
         self.last_texture_change_center_x = 0
         self.last_texture_change_center_y = 0
+        self.animation = None
 
     def update_animation(self):
-        x1 = self.center_x
-        x2 = self.last_texture_change_center_x
-        y1 = self.center_y
-        y2 = self.last_texture_change_center_y
-        distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-        texture_list = []
-
-        change_direction = False
-        if self.change_x > 0 \
-                and self.change_y == 0 \
-                and self.state != FACE_RIGHT \
-                and self.walk_right_textures \
-                and len(self.walk_right_textures) > 0:
-            self.state = FACE_RIGHT
-            change_direction = True
-        elif self.change_x < 0 and self.change_y == 0 and self.state != FACE_LEFT \
-                and self.walk_left_textures and len(self.walk_left_textures) > 0:
-            self.state = FACE_LEFT
-            change_direction = True
-        elif self.change_y < 0 and self.change_x == 0 and self.state != FACE_DOWN \
-                and self.walk_down_textures and len(self.walk_down_textures) > 0:
-            self.state = FACE_DOWN
-            change_direction = True
-        elif self.change_y > 0 and self.change_x == 0 and self.state != FACE_UP \
-                and self.walk_up_textures and len(self.walk_up_textures) > 0:
-            self.state = FACE_UP
-            change_direction = True
-
-        if self.change_x == 0 and self.change_y == 0:
-            if self.state == FACE_LEFT:
-                self.texture = self.stand_left_textures[0]
-            elif self.state == FACE_RIGHT:
-                self.texture = self.stand_right_textures[0]
-            elif self.state == FACE_UP:
-                self.texture = self.walk_up_textures[0]
-            elif self.state == FACE_DOWN:
-                self.texture = self.walk_down_textures[0]
-
-        elif change_direction or distance >= self.texture_change_distance:
-            self.last_texture_change_center_x = self.center_x
-            self.last_texture_change_center_y = self.center_y
-
-            if self.state == FACE_LEFT:
-                texture_list = self.walk_left_textures
-                if texture_list is None or len(texture_list) == 0:
-                    raise RuntimeError("update_animation was called on a sprite that doesn't have a "
-                                       "list of walk left textures.")
-            elif self.state == FACE_RIGHT:
-                texture_list = self.walk_right_textures
-                if texture_list is None or len(texture_list) == 0:
-                    raise RuntimeError("update_animation was called on a sprite that doesn't have a list of "
-                                       "walk right textures.")
-            elif self.state == FACE_UP:
-                texture_list = self.walk_up_textures
-                if texture_list is None or len(texture_list) == 0:
-                    raise RuntimeError("update_animation was called on a sprite that doesn't have a list of "
-                                       "walk up textures.")
-            elif self.state == FACE_DOWN:
-                texture_list = self.walk_down_textures
-                if texture_list is None or len(texture_list) == 0:
-                    raise RuntimeError(
-                        "update_animation was called on a sprite that doesn't have a list of walk down textures.")
-
-            self.cur_texture_index += 1
-            if self.cur_texture_index >= len(texture_list):
-                self.cur_texture_index = 0
-
-            self.texture = texture_list[self.cur_texture_index]
-
-        if self._texture is None:
-            print("Error, no texture set")
-        else:
-            self.width = self._texture.width * self.scale
-            self.height = self._texture.height * self.scale
+        if self.animation is None:
+            self.animation = animation_table(self)
+        self.animation.update(self)
+
+
+class EnemyTextures:
+    def __init__(self):
+        self.stand_right_textures = load_frames(ENEMY_STAND_FRAMES, ENEMY_SCALE)
+        self.stand_left_textures = load_frames(ENEMY_STAND_FRAMES, ENEMY_SCALE, mirrored=True)
+        self.walk_right_textures = load_frames(ENEMY_WALK_FRAMES, ENEMY_SCALE)
+        self.walk_left_textures = load_frames(ENEMY_WALK_FRAMES, ENEMY_SCALE, mirrored=True)
+        self.animation = None
+
+
+def spawn_enemy(center_x, center_y, textures):
+    enemy = Enemy()
+
+    enemy.stand_right_textures = textures.stand_right_textures
+    enemy.stand_left_textures = textures.stand_left_textures
+    enemy.walk_right_textures = textures.walk_right_textures
+    enemy.walk_left_textures = textures.walk_left_textures
+
+    enemy.texture_change_distance = 20
+    # Every zombie built from the same textures shares one animation table
+    if textures.animation is None:
+        textures.animation = animation_table(enemy)
+    enemy.animation = textures.animation
+
+    enemy.center_x = center_x
+    enemy.center_y = center_y
+    enemy.scale = ENEMY_SCALE
+    enemy.change_x = -ENEMY_SPEED
+    return enemy
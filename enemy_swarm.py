@@ -0,0 +1,117 @@
+import numpy as np
+from variables import *
+
+
+class EnemySwarm:
+    def __init__(self, enemy_list, flag_list, bounds=None):
+        self.sprites = list(enemy_list)
+        self.index = {sprite: i for i, sprite in enumerate(self.sprites)}
+        count = len(self.sprites)
+
+        self.x = np.array([sprite.center_x for sprite in self.sprites], dtype=np.float64)
+        self.y = np.array([sprite.center_y for sprite in self.sprites], dtype=np.float64)
+        self.change_x = np.array([sprite.change_x for sprite in self.sprites], dtype=np.float64)
+        self.last_change_x = np.array([sprite.last_texture_change_center_x for sprite in self.sprites],
+                                      dtype=np.float64)
+        self.alive = np.ones(count, dtype=bool)
+        self.state = np.array([sprite.state for sprite in self.sprites], dtype=np.int32)
+        self.frame = np.array([sprite.cur_texture_index for sprite in self.sprites], dtype=np.int32)
+
+        self.walk_textures = {}
+        self.change_distance_squared = 20 ** 2
+        self.half_width = np.zeros(count)
+        self.half_height = np.zeros(count)
+        # Indexed by the FACE_* state constants
+        self.frame_count = np.ones(5, dtype=np.int32)
+        if count:
+            # Every zombie shares its archetype's animation table
+            animation = self.sprites[0].animation
+            self.walk_textures = animation.walk
+            self.change_distance_squared = animation.change_distance_squared
+            for state in self.walk_textures:
+                self.frame_count[state] = animation.frame_count(state)
+            for i, sprite in enumerate(self.sprites):
+                sprite.texture = self.walk_textures[int(self.state[i])][int(self.frame[i])]
+            self.half_width[:] = [sprite.width / 2 for sprite in self.sprites]
+            self.half_height[:] = [sprite.height / 2 for sprite in self.sprites]
+
+        if bounds is None:
+            bounds = self.patrol_bounds(flag_list)
+        self.left_bound, self.right_bound = bounds
+
+    def patrol_bounds(self, flag_list):
+        if not len(flag_list):
+            count = len(self.sprites)
+            return np.full(count, -np.inf), np.full(count, np.inf)
+        return patrol_bounds(self.x, self.y, self.half_height,
+                             np.array([flag.left for flag in flag_list]),
+                             np.array([flag.right for flag in flag_list]),
+                             np.array([flag.bottom for flag in flag_list]),
+                             np.array([flag.top for flag in flag_list]))
+
+    def update(self, view_left=-np.inf, view_right=np.inf):
+        if not len(self.sprites):
+            return
+        alive = self.alive
+
+        # Animation, from the velocity the zombie had going into this tick; zombies well off screen
+        # keep their last frame and catch up when they come back into view
+        visible = alive & (self.x + self.half_width > view_left - ANIMATION_CULL_MARGIN) \
+            & (self.x - self.half_width < view_right + ANIMATION_CULL_MARGIN)
+        moving = visible & (self.change_x != 0)
+        new_state = np.where(self.change_x > 0, FACE_RIGHT,
+                             np.where(self.change_x < 0, FACE_LEFT, self.state))
+        turned = moving & (new_state != self.state)
+        self.state = np.where(visible, new_state, self.state)
+        dx = self.x - self.last_change_x
+        advance = moving & (turned | (dx * dx >= self.change_distance_squared))
+        self.last_change_x = np.where(advance, self.x, self.last_change_x)
+        self.frame = np.where(advance, (self.frame + 1) % self.frame_count[self.state], self.frame)
+
+        # Movement, turning around at the flags either side of each zombie
+        self.x = np.where(alive, self.x + self.change_x, self.x)
+        hit = alive & (((self.change_x < 0) & (self.x - self.half_width < self.left_bound))
+                       | ((self.change_x > 0) & (self.x + self.half_width > self.right_bound)))
+        self.change_x = np.where(hit, -self.change_x, self.change_x)
+
+        self.write_back(alive, advance, hit)
+
+    def write_back(self, alive, advance, hit):
+        sprites = self.sprites
+        x = self.x.tolist()
+        for i in np.flatnonzero(alive).tolist():
+            sprites[i].center_x = x[i]
+        for i in np.flatnonzero(hit).tolist():
+            sprites[i].change_x = float(self.change_x[i])
+        state = self.state.tolist()
+        frame = self.frame.tolist()
+        last_change_x = self.last_change_x.tolist()
+        for i in np.flatnonzero(advance).tolist():
+            sprite = sprites[i]
+            sprite.texture = self.walk_textures[state[i]][frame[i]]
+            # Kept on the sprite too, so a swarm rebuilt from these sprites carries on where this one was
+            sprite.state = state[i]
+            sprite.cur_texture_index = frame[i]
+            sprite.last_texture_change_center_x = last_change_x[i]
+
+    def remove(self, sprite):
+        i = self.index.get(sprite)
+        if i is not None:
+            self.alive[i] = False
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+
+def patrol_bounds(x, y, half_height, flag_left, flag_right, flag_bottom, flag_top):
+    # Nearest flag edge either side of each zombie, taken from flags sharing some of its height
+    if not len(x) or not len(flag_left):
+        return np.full(len(x), -np.inf), np.full(len(x), np.inf)
+    flag_center = (flag_left + flag_right) / 2
+    same_row = (flag_bottom[None, :] <= (y + half_height)[:, None]) \
+        & (flag_top[None, :] >= (y - half_height)[:, None])
+    on_left = same_row & (flag_center[None, :] < x[:, None])
+    on_right = same_row & (flag_center[None, :] >= x[:, None])
+    left_bound = np.where(on_left, flag_right[None, :], -np.inf).max(axis=1)
+    right_bound = np.where(on_right, flag_left[None, :], np.inf).min(axis=1)
+    return left_bound, right_bound
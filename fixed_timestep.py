@@ -0,0 +1,83 @@
+from variables import *
+
+
+class FixedTimestep:
+    def __init__(self, rate: float = SIMULATION_RATE, max_ticks: int = MAX_TICKS_PER_FRAME):
+        self.tick_time = 1 / rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
+
+    def advance(self, delta_time):
+        self.accumulator += delta_time
+        ticks = int(self.accumulator / self.tick_time)
+        if ticks > self.max_ticks:
+            # Too far behind to catch up; let the game slow down instead of falling further behind
+            self.dropped_time += (ticks - self.max_ticks) * self.tick_time
+            ticks = self.max_ticks
+            self.accumulator = self.tick_time * ticks + self.accumulator % self.tick_time
+        self.accumulator -= ticks * self.tick_time
+        return ticks
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.tick_time
+
+
+def lerp(previous, current, alpha):
+    if abs(current - previous) > INTERPOLATION_SNAP_DISTANCE:
+        # Respawns and level changes jump, they don't slide
+        return current
+    return previous + (current - previous) * alpha
+
+
+class Interpolator:
+    def __init__(self):
+        self.players = {}
+        self.swarm = None
+        self.enemy_x = None
+        self.bullets = {}
+        self.view = None
+        self.saved = []
+
+    def capture(self, world):
+        self.players = {player: (player.center_x, player.center_y) for player in world.players}
+        self.swarm = world.enemy_swarm
+        self.enemy_x = world.enemy_swarm.x.copy()
+        self.bullets = {bullet: (bullet.center_x, bullet.center_y, bullet.age) for bullet in world.bullet_list}
+        self.view = (world.view_left, world.view_bottom)
+
+    def view_at(self, world, alpha):
+        if self.view is None:
+            return world.view_left, world.view_bottom
+        return (int(lerp(self.view[0], world.view_left, alpha)),
+                int(lerp(self.view[1], world.view_bottom, alpha)))
+
+    def move(self, sprite, center_x, center_y):
+        self.saved.append((sprite, sprite.center_x, sprite.center_y))
+        sprite.center_x = center_x
+        sprite.center_y = center_y
+
+    def apply(self, world, alpha):
+        # Puts the moving sprites part way between the last two ticks; restore() puts them back
+        for player in world.players:
+            previous = self.players.get(player)
+            if previous is not None:
+                self.move(player, lerp(previous[0], player.center_x, alpha), lerp(previous[1], player.center_y, alpha))
+        if world.enemy_swarm is self.swarm:
+            swarm = world.enemy_swarm
+            for i in swarm.alive.nonzero()[0].tolist():
+                sprite = swarm.sprites[i]
+                self.move(sprite, lerp(self.enemy_x[i], sprite.center_x, alpha), sprite.center_y)
+        for bullet in world.bullet_list:
+            previous = self.bullets.get(bullet)
+            # A recycled bullet has restarted its age, so it has no previous position on this flight
+            if previous is not None and bullet.age == previous[2] + 1:
+                self.move(bullet, lerp(previous[0], bullet.center_x, alpha),
+                          lerp(previous[1], bullet.center_y, alpha))
+
+    def restore(self):
+        for sprite, center_x, center_y in self.saved:
+            sprite.center_x = center_x
+            sprite.center_y = center_y
+        self.saved.clear()
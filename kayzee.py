@@ -1,65 +1,85 @@
+from startup import timeline
+import argparse
 import os
-import arcade
-from player import Player, get_distance_between_sprites
-from enemy import Enemy
-from input_handler import *
-from commands import *
-from variables import *
-import random
 import timeit
+import arcade
+from level_loader import LevelLoader
+from simulation import World
+from profiler import profiler
+from music_manager import MusicManager, music_file_name
+from sound_bank import SoundBank
+from fixed_timestep import FixedTimestep, Interpolator
+from replay import InputRecorder, Recording, ReplayDriver
+from lockstep import TwoPlayerWorld, LockstepPeer, host, join
+from input_handler import InputHandler
+from commands import JumpCommand, ShootCommand, WalkLeftCommand, WalkRightCommand, StopWalkingCommand
+from variables import (SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, START_LEVEL, LEVEL_EVENT, HUD_TIMING_REFRESH,
+                       PROFILER_FILE_NAME, PROFILER_OVERLAY_REFRESH, STARTUP_REPORT_FILE_NAME, LOCKSTEP_PORT)
+
+timeline.mark("imports")
 
 
 class MyGame(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    def __init__(self, record_file=None, replay_file=None, startup_report_file=None, session=None):
+        # The first level and its music load on worker threads while the window comes up
         self.set_file_path()
-        self.init_lists_player()
+        self.session = session
+        self.recording = Recording.load(replay_file) if replay_file is not None else None
+        self.level = self.first_level()
+        self.level_loader = LevelLoader()
+        self.level_loader.prefetch(self.level)
+        self.music = MusicManager()
+        self.music.prefetch(music_file_name(self.level))
+        timeline.mark("prefetch started")
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+        timeline.mark("window created")
+        self.record_file = record_file
+        self.startup_report_file = startup_report_file
+        self.lockstep = None
+        self.first_frame_drawn = False
+        self.recorder = None
+        self.replay_driver = None
         self.init_game_mechanics()
         self.init_sounds()
         self.init_handlers()
         self.init_commands()
         self.background = None
         self.font_color = None
-        self.bg_music = None
-        self.prev_music = None
-        self.bg_music_length = None
-        self.total_time = 0.0
+        self.timestep = FixedTimestep()
+        self.interpolator = Interpolator()
+        self.view_left = 0
+        self.view_bottom = 0
 
     def set_file_path(self):
         file_path = os.path.dirname(os.path.abspath(__file__))
         os.chdir(file_path)
 
-    def init_lists_player(self):
-        self.coin_list = None
-        self.wall_list = None
-        self.foreground_list = None
-        self.background_list = None
-        self.dont_touch_list = None
-        self.player_list = None
-        self.bullet_list = None
-        self.enemy_list = None
-        self.flag_list = None
-        self.player = None
+    def first_level(self):
+        # Joining or hosting plays the host's level, and a replay the level it was recorded on
+        if self.session is not None:
+            return self.session[2]
+        if self.recording is not None:
+            return self.recording.level
+        return START_LEVEL
 
     def init_game_mechanics(self):
-        self.physics_engine = None
-        self.view_bottom = 0
-        self.view_left = 0
-        self.score = 0
-        self.end_of_map = 0
-        self.level = 1
+        if self.session is not None:
+            self.world = TwoPlayerWorld(self.level_loader)
+        else:
+            self.world = World(self.level_loader)
         self.processing_time = 0
         self.draw_time = 0
         self.frame_count = 0
         self.fps_start_timer = None
         self.fps = None
+        self.profiler_lines = []
+        self.profiler_refresh_time = 0
+        self.timing_text = []
+        self.timing_refresh_time = 0
 
     def init_sounds(self):
-        self.collect_coin_sound = arcade.load_sound("sounds/coin1.wav")
-        self.jump_sound = arcade.load_sound("sounds/jump1.wav")
-        self.game_over = arcade.load_sound("sounds/gameover1.wav")
-        self.gun_sound = arcade.sound.load_sound("sounds/laser1.wav")
-        self.hit_sound = arcade.sound.load_sound("sounds/laser4.wav")
+        self.sound_bank = SoundBank()
+        timeline.mark("sounds queued")
 
     def init_handlers(self):
         self.input_handler = None
@@ -72,42 +92,34 @@ class MyGame(arcade.Window):
         self.stop_walking_command = None
 
     def setup(self, level):
-        self.setup_game_mechanics()
-        my_map = self.read_map(level)
-        self.setup_lists(my_map)
-        self.setup_enemies(my_map)
-        self.setup_player()
+        if self.session is not None:
+            connection, index, _, input_delay = self.session
+            self.world.setup(level)
+            self.lockstep = LockstepPeer(self.world, connection, index, input_delay)
+        elif self.recording is not None:
+            self.replay_driver = ReplayDriver(self.recording, self.world)
+        else:
+            self.world.setup(level)
+            if self.record_file is not None:
+                self.recorder = InputRecorder(self.world)
+        self.setup_level()
+
+    def setup_level(self):
+        loaded_level = self.world.loaded_level
+        self.level = self.world.level
         self.setup_commands()
         self.setup_handler()
+        if loaded_level.background_color:
+            arcade.set_background_color(loaded_level.background_color)
         self.font_color = arcade.color.WHITE
         if self.level == 1 or self.level == 3 or self.level == 6:
             self.font_color = arcade.color.BLACK
-        self.prev_music = self.bg_music
-        self.bg_music = arcade.load_sound(f"music/music_{self.level}.mp3")
-        if self.prev_music is not None:
-            if not arcade.is_queued(self.prev_music):
-                arcade.play_sound(self.bg_music)
-        else:
-            arcade.play_sound(self.bg_music)
-        if self.level == 1:
-            self.bg_music_length = 34
-        elif self.level == 2:
-            self.bg_music_length = 32
-        elif self.level == 3:
-            self.bg_music_length = 53
-        elif self.level == 4:
-            self.bg_music_length = 39
-        elif self.level == 5:
-            self.bg_music_length = 27
-        elif self.level == 6:
-            self.bg_music_length = 42
-        self.total_time = 0.0
-        self.background = arcade.load_texture(f"images/backgrounds/BG_{self.level}.png")
-
-    def setup_game_mechanics(self):
-        self.view_bottom = 0
-        self.view_left = 0
-        self.score = 0
+        self.music.play(music_file_name(self.level))
+        # Decode the next track while this level is played
+        if os.path.exists(music_file_name(self.level + 1)):
+            self.music.prefetch(music_file_name(self.level + 1))
+        self.background = loaded_level.background
+        self.interpolator = Interpolator()
 
     def setup_commands(self):
         self.jump_command = JumpCommand()
@@ -120,125 +132,81 @@ class MyGame(arcade.Window):
         self.input_handler = InputHandler(self.shoot_command, self.jump_command, self.walk_left_command,
                                           self.walk_right_command, self.stop_walking_command)
 
-    def setup_player(self):
-        self.player = Player()
-        self.player.stand_right_textures = []
-        self.player.stand_left_textures = []
-        self.player.walk_right_textures = []
-        self.player.walk_left_textures = []
-        self.player.stand_right_textures.append(arcade.load_texture("images/player_3/stand/0.png",
-                                                                    scale=CHARACTER_SCALING))
-        self.player.stand_left_textures.append(arcade.load_texture("images/player_3/stand/0.png",
-                                                                   scale=CHARACTER_SCALING, mirrored=True))
-        for i in range(8):
-            self.player.walk_right_textures.append(arcade.load_texture("images/player_3/walk/"+str(i)+".png",
-                                                                       scale=CHARACTER_SCALING))
-        for i in range(8):
-            self.player.walk_left_textures.append(arcade.load_texture("images/player_3/walk/"+str(i)+".png",
-                                                                      scale=CHARACTER_SCALING, mirrored=True))
-
-        self.player.texture_change_distance = 25
-        self.player.center_x = PLAYER_START_X
-        self.player.center_y = PLAYER_START_Y
-        self.player.scale = CHARACTER_SCALING
-        self.physics_engine = arcade.PhysicsEnginePlatformer(self.player,
-                                                             self.wall_list,
-                                                             GRAVITY)
-        self.player.physics_engine = self.physics_engine
-        self.player_list.append(self.player)
-
-    def setup_lists(self, my_map):
-        self.assign_lists()
-        self.generate_lists(my_map)
-        if my_map.backgroundcolor:
-            arcade.set_background_color(my_map.backgroundcolor)
-
-    def assign_lists(self):
-        self.player_list = arcade.SpriteList()
-        self.coin_list = arcade.SpriteList()
-        self.wall_list = arcade.SpriteList()
-        self.dont_touch_list = arcade.SpriteList()
-        self.foreground_list = arcade.SpriteList()
-        self.background_list = arcade.SpriteList()
-        self.bullet_list = arcade.SpriteList()
-        self.enemy_list = arcade.SpriteList()
-        self.flag_list = arcade.SpriteList()
-
-    def generate_lists(self, my_map):
-        platforms_layer_name = "Platforms"
-        coins_layer_name = "Coins"
-        foreground_layer_name = "Foreground"
-        background_layer_name = "Background"
-        dont_touch_layer_name = "Don't Touch"
-        flag_layer_name = "Flags"
-
-        self.background_list = arcade.generate_sprites(my_map, background_layer_name, TILE_SCALING)
-        self.foreground_list = arcade.generate_sprites(my_map, foreground_layer_name, TILE_SCALING)
-        self.wall_list = arcade.generate_sprites(my_map, platforms_layer_name, TILE_SCALING)
-        #self.wall_list = arcade.generate_sprites(my_map, platforms_layer_name, TILE_SCALING)
-        self.coin_list = arcade.generate_sprites(my_map, coins_layer_name, TILE_SCALING)
-        self.dont_touch_list = arcade.generate_sprites(my_map, dont_touch_layer_name, TILE_SCALING)
-        self.flag_list = arcade.generate_sprites(my_map, flag_layer_name, TILE_SCALING)
-
-    def read_map(self, level):
-        platforms_layer_name = "Platforms"
-        map_name = f"map2_level_{level}.tmx"
-        my_map = arcade.read_tiled_map(map_name, TILE_SCALING)
-        map_array = my_map.layers_int_data[platforms_layer_name]
-        self.end_of_map = (len(map_array[0])-1) * GRID_PIXEL_SIZE
-        return my_map
-
-
-    def setup_enemies(self, my_map):
-        enemy_layer_name = "Enemies"
-        e_list = arcade.generate_sprites(my_map, enemy_layer_name, ENEMY_SCALE)
-        for e in e_list:
-            enemy = Enemy()
-
-            enemy.stand_right_textures = []
-            enemy.stand_left_textures = []
-            enemy.walk_right_textures = []
-            enemy.walk_left_textures = []
-
-            enemy.stand_right_textures.append(arcade.load_texture("images/zombies/stand/0.png",
-                                                                  scale=ENEMY_SCALE))
-            enemy.stand_left_textures.append(arcade.load_texture("images/zombies/stand/0.png",
-                                                                 scale=ENEMY_SCALE, mirrored=True))
-            for i in range(10):
-                enemy.walk_right_textures.append(
-                    arcade.load_texture("images/zombies/walk/" + str(i) + ".png",
-                                        scale=ENEMY_SCALE))
-            for i in range(10):
-                enemy.walk_left_textures.append(arcade.load_texture("images/zombies/walk/" + str(i) + ".png",
-                                                                    scale=ENEMY_SCALE, mirrored=True))
-
-            enemy.texture_change_distance = 20
-
-            enemy.center_x = e.center_x
-            enemy.center_y = e.center_y + 64
-            enemy.scale = ENEMY_SCALE
-            enemy.change_x = -ENEMY_SPEED
-            self.enemy_list.append(enemy)
-
     def on_draw(self):
         # Start timing how long this takes
         draw_start_time = timeit.default_timer()
         self.calculate_fps()
         arcade.start_render()
+        world = self.world
+        alpha = self.timestep.alpha
+        self.view_left, self.view_bottom = self.interpolator.view_at(world, alpha)
+        arcade.set_viewport(self.view_left, self.view_left + SCREEN_WIDTH,
+                            self.view_bottom, self.view_bottom + SCREEN_HEIGHT)
+        self.interpolator.apply(world, alpha)
+        start = profiler.start()
         arcade.draw_texture_rectangle((SCREEN_WIDTH // 2) + self.view_left, (SCREEN_HEIGHT // 2) + self.view_bottom,
                                       SCREEN_WIDTH, SCREEN_HEIGHT, self.background)
-        self.background_list.draw()
-        self.wall_list.draw()
-        self.coin_list.draw()
-        self.dont_touch_list.draw()
-        self.enemy_list.draw()
-        self.bullet_list.draw()
+        profiler.stop("draw background", start)
+        self.draw_chunks("draw background_list", world.background_chunks)
+        self.draw_chunks("draw wall_list", world.wall_chunks)
+        self.draw_chunks("draw coin_list", world.coin_chunks)
+        self.draw_chunks("draw dont_touch_list", world.dont_touch_chunks)
+        self.draw_list("draw enemy_list", world.enemy_list)
+        self.draw_list("draw bullet_list", world.bullet_list)
         try:
-            self.player_list.draw()
+            self.draw_list("draw player_list", world.player_list)
         except:
             pass
-        self.foreground_list.draw()
+        self.draw_chunks("draw foreground_list", world.foreground_chunks)
+        self.interpolator.restore()
+        start = profiler.start()
         self.draw_hud(draw_start_time)
+        if profiler.enabled:
+            self.draw_profiler_overlay()
+        profiler.stop("draw hud", start)
+        profiler.end_frame()
+        if not self.first_frame_drawn:
+            self.report_startup()
+
+    def report_startup(self):
+        self.first_frame_drawn = True
+        timeline.mark("first frame")
+        print(timeline.report())
+        if self.startup_report_file is not None:
+            timeline.dump_json(self.startup_report_file)
+
+    def draw_chunks(self, span_name, chunked_layer):
+        start = profiler.start()
+        chunked_layer.draw(self.view_left, self.view_left + SCREEN_WIDTH)
+        profiler.stop(span_name, start)
+
+    def draw_list(self, span_name, sprite_list):
+        start = profiler.start()
+        sprite_list.draw()
+        profiler.stop(span_name, start)
+
+    def refresh_profiler_lines(self):
+        # The span names and each number are separate labels, rounded to a tenth of a millisecond, so the
+        # overlay keeps drawing the same few strings instead of rasterising new ones in the frames it measures
+        now = timeit.default_timer()
+        if now - self.profiler_refresh_time < PROFILER_OVERLAY_REFRESH and self.profiler_lines:
+            return
+        self.profiler_refresh_time = now
+        self.profiler_lines = [(f"{name}:", [f"{value:.1f}" for value in values])
+                               for name, values in profiler.percentiles().items()]
+
+    def draw_profiler_overlay(self):
+        self.refresh_profiler_lines()
+        x = self.view_left + SCREEN_WIDTH - 380
+        y = self.view_bottom + SCREEN_HEIGHT - 20
+        arcade.draw_text("span", x, y, self.font_color, 12)
+        for i, heading in enumerate(("p50", "p95", "p99 ms")):
+            arcade.draw_text(heading, x + 230 + 50 * i, y, self.font_color, 12)
+        for name, values in self.profiler_lines:
+            y -= 16
+            arcade.draw_text(name, x, y, self.font_color, 12)
+            for i, value in enumerate(values):
+                arcade.draw_text(value, x + 230 + 50 * i, y, self.font_color, 12)
 
 
     def calculate_fps(self):
@@ -250,27 +218,31 @@ class MyGame(arcade.Window):
         self.frame_count += 1
 
     def draw_bottom_hud(self):
-        score_text = f"Score: {self.score}"
-        arcade.draw_text(score_text, 10 + self.view_left,
-                         10 + self.view_bottom,
-                         self.font_color, 18)
-        level_text = f"Level: {self.level}"
-        arcade.draw_text(level_text, 150 + self.view_left,
-                         10 + self.view_bottom,
-                         self.font_color, 18)
+        view_left = self.view_left
+        view_bottom = self.view_bottom
+        arcade.draw_text(f"Score: {self.world.score}", 10 + view_left, 10 + view_bottom, self.font_color, 18)
+        arcade.draw_text(f"Level: {self.level}", 150 + view_left, 10 + view_bottom, self.font_color, 18)
+
+    def refresh_timing_text(self):
+        # Timings change every frame, so only re-format them a few times a second; every new string is a
+        # new texture in arcade.draw_text's cache
+        now = timeit.default_timer()
+        if now - self.timing_refresh_time < HUD_TIMING_REFRESH:
+            return
+        self.timing_refresh_time = now
+        self.timing_text = [f"Processing time: {self.processing_time:.3f}",
+                            f"Drawing time: {self.draw_time:.3f}"]
+        if self.fps is not None:
+            self.timing_text.append(f"FPS: {self.fps:.0f}")
 
     def draw_top_hud(self, draw_start_time):
+        view_left = self.view_left
+        view_bottom = self.view_bottom
         # Display timings
-        output = f"Processing time: {self.processing_time:.3f}"
-        arcade.draw_text(output, 10 + self.view_left, self.view_bottom + (SCREEN_HEIGHT-20),
-                        self.font_color, 16)
-
-        output = f"Drawing time: {self.draw_time:.3f}"
-        arcade.draw_text(output, 10 + self.view_left, self.view_bottom + (SCREEN_HEIGHT-40), self.font_color, 16)
-
-        if self.fps is not None:
-            output = f"FPS: {self.fps:.0f}"
-            arcade.draw_text(output, 10 + self.view_left, self.view_bottom + (SCREEN_HEIGHT-60), self.font_color, 16)
+        self.refresh_timing_text()
+        for i, output in enumerate(self.timing_text):
+            arcade.draw_text(output, 10 + view_left, view_bottom + (SCREEN_HEIGHT - 20 * (i + 1)),
+                             self.font_color, 16)
 
         self.draw_time = timeit.default_timer() - draw_start_time
 
@@ -279,140 +251,115 @@ class MyGame(arcade.Window):
         self.draw_top_hud(draw_start_time)
 
     def on_key_press(self, symbol: int, modifiers: int):
+        if symbol == arcade.key.P:
+            profiler.toggle()
+            self.profiler_lines = []
+        elif symbol == arcade.key.O:
+            profiler.dump()
+            print(f"Profile written to {PROFILER_FILE_NAME}.csv and {PROFILER_FILE_NAME}.json")
+        elif symbol == arcade.key.R and self.lockstep is None and self.recorder is None \
+                and self.replay_driver is None:
+            self.world.restart()
+            self.setup_level()
         command = self.input_handler.handle_key_press(symbol)
         if command:
-            command.execute(self.player)
+            self.execute(command)
 
     def on_key_release(self, symbol: int, modifiers: int):
         command = self.input_handler.handle_key_release(symbol)
         if command:
-            command.execute(self.player)
+            self.execute(command)
+
+    def execute(self, command):
+        if self.replay_driver is not None:
+            return
+        if self.lockstep is not None:
+            self.lockstep.execute(command)
+            return
+        if self.recorder is not None:
+            self.recorder.execute(command)
+        else:
+            self.world.execute(command)
+
+    def step(self):
+        if self.lockstep is not None:
+            # Without the other player's input for this tick there is nothing to do until it arrives
+            return self.lockstep.step()
+        if self.replay_driver is not None:
+            if not self.replay_driver.finished:
+                self.replay_driver.step()
+        elif self.recorder is not None:
+            self.recorder.step()
+        else:
+            self.world.step()
+        return True
+
+    def end_session(self, error):
+        print(f"{error}, ending the game.")
+        self.lockstep.close()
+        self.lockstep = None
+        arcade.close_window()
+
+    def save_recording(self):
+        if self.recorder is not None:
+            self.recorder.save(self.record_file)
+            print(f"Saved {self.recorder.recording.tick_count} ticks to {self.record_file}")
+        if self.replay_driver is not None and self.replay_driver.diverged_tick is not None:
+            print(f"Replay diverged at tick {self.replay_driver.diverged_tick}")
 
     def update(self, delta_time: float):
-        # self.total_time += delta_time
-        # seconds = int(self.total_time) % 60
-        # if seconds > self.bg_music_length:
-        #     arcade.play_sound(self.bg_music)
-        #     self.total_time = 0.0
-
-        if not arcade.is_queued(self.bg_music) and not arcade.is_queued(self.prev_music):
-            arcade.play_sound(self.bg_music)
         draw_start_time = timeit.default_timer()
-        self.physics_engine.update()
-        changed_viewport = self.update_player()
-        self.update_view_port(changed_viewport)
-        self.update_bullets()
-        self.update_enemies()
+        ticks = self.timestep.advance(delta_time)
+        for tick in range(ticks):
+            if tick == ticks - 1:
+                self.interpolator.capture(self.world)
+            try:
+                if not self.step():
+                    break
+            except ConnectionError as e:
+                self.end_session(e)
+                return
         self.processing_time = timeit.default_timer() - draw_start_time
+        self.play_events()
 
+    def play_events(self):
+        for event in self.world.drain_events():
+            if event == LEVEL_EVENT:
+                self.setup_level()
+            else:
+                self.sound_bank.queue(event)
+        self.sound_bank.flush()
 
-    def update_player(self):
-        self.player_list.update_animation()
-        coin_hitlist = arcade.check_for_collision_with_list(self.player,
-                                                            self.coin_list)
-        for coin in coin_hitlist:
-            coin.kill()
-            arcade.play_sound(self.collect_coin_sound)
-            self.score += 1
-
-        enemy_player_hitlist = arcade.check_for_collision_with_list(self.player,
-                                                                    self.enemy_list)
-        if len(enemy_player_hitlist) > 0:
-            self.player.center_x = PLAYER_START_X
-            self.player.center_y = PLAYER_START_Y
-            arcade.play_sound(self.game_over)
-
-        changed_viewport = False
-
-        if self.player.center_y < 100:
-            self.player.center_x = PLAYER_START_X
-            self.player.center_Y = PLAYER_START_Y
-
-            self.view_left = 0
-            self.view_bottom = 0
-            changed_viewport = True
-
-            arcade.play_sound(self.game_over)
-
-        if arcade.check_for_collision_with_list(self.player, self.dont_touch_list):
-            self.player.center_x = PLAYER_START_X
-            self.player.center_y = PLAYER_START_Y
-
-            # Set the camera to the start
-            self.view_left = 0
-            self.view_bottom = 0
-            changed_viewport = True
-            arcade.play_sound(self.game_over)
-
-        if self.player.center_x >= self.end_of_map:
-            print("Advance ****")
-            self.level += 1
-            # if self.bg_music is not None:
-            #     arcade.stop_sound(self.bg_music)
-            self.setup(self.level)
-
-            self.view_left = 0
-            self.view_bottom = 0
-            changed_viewport = True
-        return changed_viewport
-
-    def update_bullets(self):
-        self.bullet_list = self.player.bullet_list
-        self.bullet_list.update()
-        for bullet in self.bullet_list:
-            enemy_bullet_hitlist = arcade.check_for_collision_with_list(bullet,
-                                                                         self.enemy_list)
-
-            if len(enemy_bullet_hitlist) > 0:
-                bullet.kill()
-
-            for enemy in enemy_bullet_hitlist:
-                enemy.kill()
-                self.score += 100
-                arcade.play_sound(self.hit_sound)
-
-    def update_enemies(self):
-        self.enemy_list.update_animation()
-        for enemy in self.enemy_list:
-            enemy.center_x += enemy.change_x
-            enemy_flag_hitlist = arcade.check_for_collision_with_list(enemy, self.flag_list)
-            if enemy_flag_hitlist:
-                enemy.change_x = -enemy.change_x
-
-    def update_view_port(self, changed_viewport):
-        left_boundary = self.view_left + LEFT_VIEWPORT_MARGIN
-        if self.player.left < left_boundary:
-            self.view_left -= left_boundary - self.player.left
-            changed_viewport = True
-
-        right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_VIEWPORT_MARGIN
-        if self.player.right > right_boundary:
-            self.view_left += self.player.right - right_boundary
-            changed_viewport = True
-
-        top_boundary = self.view_bottom + SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
-        if self.player.top > top_boundary:
-            self.view_bottom += self.player.top - top_boundary
-            changed_viewport = True
-
-        bottom_boundary = self.view_bottom + BOTTOM_VIEWPORT_MARGIN
-        if self.player.bottom < bottom_boundary:
-            self.view_bottom -= bottom_boundary - self.player.bottom
-            changed_viewport = True
-
-        if changed_viewport:
-            self.view_bottom = int(self.view_bottom)
-            self.view_left = int(self.view_left)
-
-            arcade.set_viewport(self.view_left,
-                                self.view_left + SCREEN_WIDTH,
-                                self.view_bottom,
-                                self.view_bottom + SCREEN_HEIGHT)
 
 def main():
-    window = MyGame()
+    parser = argparse.ArgumentParser(description="Kayzee")
+    parser.add_argument("--record", metavar="FILE", help="record the inputs of this session")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded session")
+    parser.add_argument("--host", metavar="PORT", type=int, nargs="?", const=LOCKSTEP_PORT,
+                        help="wait for a second player to join")
+    parser.add_argument("--join", metavar="HOST[:PORT]", help="join a game hosted by another player")
+    parser.add_argument("--startup-report", metavar="FILE", nargs="?", const=STARTUP_REPORT_FILE_NAME,
+                        help="write the startup timeline to a JSON file")
+    args = parser.parse_args()
+
+    session = None
+    if args.host is not None:
+        print(f"Waiting for player two on port {args.host}")
+        connection, level, input_delay = host(args.host)
+        session = (connection, 0, level, input_delay)
+    elif args.join is not None:
+        connection, level, input_delay = join(args.join)
+        session = (connection, 1, level, input_delay)
+
+    window = MyGame(args.record, args.replay, args.startup_report, session)
     window.setup(window.level)
+    timeline.mark("level setup")
     arcade.run()
+    window.music.shutdown()
+    window.sound_bank.shutdown()
+    window.save_recording()
+    if window.lockstep is not None:
+        window.lockstep.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,232 @@
+import glob
+import hashlib
+import json
+import os
+import struct
+import arcade
+import numpy as np
+from texture_cache import texture_cache
+from variables import *
+
+MAGIC = b"KZL1"
+HEADER_FORMAT = "<4sI"
+ALIGNMENT = 8
+
+
+class CompiledTile:
+    def __init__(self, source, points):
+        self.source = source
+        self.points = points
+
+
+class CompiledMap:
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.tilewidth = 0
+        self.tileheight = 0
+        self.backgroundcolor = None
+        self.global_tile_set = {}
+        self.layers_int_data = {}
+        self.tiles = {}
+
+
+def cache_file_name(tmx_file):
+    # Kept beside the map, so same named maps in other directories never overwrite each other's entry
+    directory, name = os.path.split(tmx_file)
+    return os.path.join(directory, LEVEL_CACHE_DIRECTORY, os.path.splitext(name)[0] + ".kzl")
+
+
+def file_hash(file_name):
+    with open(file_name, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def compile_map(tmx_file, scaling):
+    my_map = arcade.read_tiled_map(tmx_file, scaling)
+    compiled = CompiledMap()
+    compiled.width = my_map.width
+    compiled.height = my_map.height
+    compiled.tilewidth = my_map.tilewidth
+    compiled.tileheight = my_map.tileheight
+    compiled.backgroundcolor = my_map.backgroundcolor
+    for name, grid in my_map.layers_int_data.items():
+        grid = np.array(grid, dtype=np.uint32)
+        rows, cols = np.nonzero(grid)
+        compiled.layers_int_data[name] = grid
+        compiled.tiles[name] = (cols.astype(np.uint32), rows.astype(np.uint32), grid[rows, cols])
+        # Only keep the part of the tileset this map actually uses
+        for gid in np.unique(grid[rows, cols]).tolist():
+            tile = my_map.global_tile_set.get(str(gid))
+            if tile is not None:
+                compiled.global_tile_set[str(gid)] = CompiledTile(tile.source, tile.points)
+    return compiled
+
+
+def write_file(cache_file, header, body):
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(header_bytes) + struct.calcsize(HEADER_FORMAT)) % ALIGNMENT)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = cache_file + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for data in body:
+            f.write(data)
+    os.replace(temp_file, cache_file)
+
+
+def write_compiled(compiled, cache_file, tmx_file, scaling):
+    arrays = []
+    layers = []
+    offset = 0
+    for name, grid in compiled.layers_int_data.items():
+        layer = {"name": name}
+        for field, array in zip(("grid", "cols", "rows", "gids"), (grid,) + compiled.tiles[name]):
+            layer[field] = [offset, array.dtype.str, list(array.shape)]
+            data = array.tobytes()
+            padding = -len(data) % ALIGNMENT
+            arrays.append(data + b"\0" * padding)
+            offset += len(data) + padding
+        layers.append(layer)
+
+    stat = os.stat(tmx_file)
+    header = {"source_size": stat.st_size,
+              "source_mtime": stat.st_mtime_ns,
+              "source_hash": file_hash(tmx_file),
+              "scaling": scaling,
+              "width": compiled.width,
+              "height": compiled.height,
+              "tilewidth": compiled.tilewidth,
+              "tileheight": compiled.tileheight,
+              "backgroundcolor": compiled.backgroundcolor,
+              "tiles": {key: [tile.source, tile.points] for key, tile in compiled.global_tile_set.items()},
+              "layers": layers}
+    write_file(cache_file, header, arrays)
+
+
+def read_compiled(cache_file, tmx_file, scaling):
+    try:
+        with open(cache_file, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    # A truncated or corrupt file, say from a crash part way through writing it, is just a miss
+    try:
+        compiled, header, body = parse_compiled(data, scaling)
+    except (struct.error, ValueError, KeyError):
+        return None
+    if compiled is None:
+        return None
+
+    stat = os.stat(tmx_file)
+    if header["source_size"] != stat.st_size or header["source_mtime"] != stat.st_mtime_ns:
+        # Touched but possibly unchanged, so fall back to comparing contents
+        if header["source_hash"] != file_hash(tmx_file):
+            return None
+        # Still the same map, so remember the new mtime rather than hashing it again on every load
+        header["source_size"] = stat.st_size
+        header["source_mtime"] = stat.st_mtime_ns
+        try:
+            write_file(cache_file, header, [body])
+        except OSError as e:
+            print(f"Unable to write level cache {cache_file}.", e)
+    return compiled
+
+
+def parse_compiled(data, scaling):
+    prefix_size = struct.calcsize(HEADER_FORMAT)
+    magic, header_size = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != MAGIC:
+        return None, None, None
+    header = json.loads(data[prefix_size:prefix_size + header_size].decode("utf-8"))
+    if header["scaling"] != scaling:
+        return None, None, None
+
+    compiled = CompiledMap()
+    compiled.width = header["width"]
+    compiled.height = header["height"]
+    compiled.tilewidth = header["tilewidth"]
+    compiled.tileheight = header["tileheight"]
+    if header["backgroundcolor"] is not None:
+        compiled.backgroundcolor = tuple(header["backgroundcolor"])
+    for key, (source, points) in header["tiles"].items():
+        compiled.global_tile_set[key] = CompiledTile(source, points)
+
+    body = memoryview(data)[prefix_size + header_size:]
+    for layer in header["layers"]:
+        arrays = []
+        for field in ("grid", "cols", "rows", "gids"):
+            offset, dtype, shape = layer[field]
+            count = int(np.prod(shape))
+            arrays.append(np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape))
+        compiled.layers_int_data[layer["name"]] = arrays[0]
+        compiled.tiles[layer["name"]] = tuple(arrays[1:])
+    return compiled, header, body
+
+
+def load_map(tmx_file, scaling):
+    cache_file = cache_file_name(tmx_file)
+    compiled = read_compiled(cache_file, tmx_file, scaling)
+    if compiled is None:
+        compiled = compile_map(tmx_file, scaling)
+        try:
+            write_compiled(compiled, cache_file, tmx_file, scaling)
+        except OSError as e:
+            print(f"Unable to write level cache {cache_file}.", e)
+    return compiled
+
+
+def tile_positions(compiled, layer_name, scaling, indices=None):
+    cols, rows, gids = compiled.tiles[layer_name]
+    if indices is not None:
+        cols, rows, gids = cols[indices], rows[indices], gids[indices]
+    rights = cols * (compiled.tilewidth * scaling)
+    tops = (compiled.height - rows.astype(np.int32)) * (compiled.tileheight * scaling)
+    return rights.tolist(), tops.tolist(), gids.tolist()
+
+
+def tile_sprites(compiled, layer_name, scaling, indices=None):
+    if indices is None:
+        indices = np.arange(len(compiled.tiles[layer_name][2]))
+    sprites = []
+    for right, top, gid, index in zip(*tile_positions(compiled, layer_name, scaling, indices), indices.tolist()):
+        tile = compiled.global_tile_set.get(str(gid))
+        if tile is None:
+            print(f"Warning, could not find {gid} image to load.")
+            continue
+        sprite = arcade.Sprite(scale=scaling)
+        sprite.texture = texture_cache.load(tile.source, scaling)
+        # Same placement as arcade.generate_sprites
+        sprite.right = right
+        sprite.top = top
+        if tile.points is not None:
+            sprite.set_points(tile.points)
+        # Position of the tile in the layer, for level streaming to track it by
+        sprite.tile_index = index
+        sprites.append(sprite)
+    return sprites
+
+
+def generate_sprites(compiled, layer_name, scaling):
+    sprite_list = arcade.SpriteList()
+    if layer_name not in compiled.tiles:
+        print(f"Warning, no layer named '{layer_name}'.")
+        return sprite_list
+    for sprite in tile_sprites(compiled, layer_name, scaling):
+        sprite_list.append(sprite)
+    return sprite_list
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    for tmx_file in sorted(glob.glob("map2_level_*.tmx")):
+        compiled = compile_map(tmx_file, TILE_SCALING)
+        write_compiled(compiled, cache_file_name(tmx_file), tmx_file, TILE_SCALING)
+        print(f"Compiled {tmx_file} -> {cache_file_name(tmx_file)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import arcade
+from enemy import EnemyTextures, spawn_enemy
+from level_cache import load_map, generate_sprites
+from spatial_index import SpatialIndex
+from chunked_layer import ChunkedLayer
+from baked_layer import bake_static_layers
+from level_stream import LevelStream
+from enemy_swarm import EnemySwarm
+from texture_cache import texture_cache
+from variables import *
+
+
+class LoadedLevel:
+    def __init__(self, number):
+        self.number = number
+        self.my_map = None
+        self.end_of_map = 0
+        self.background_color = None
+        self.coin_list = None
+        self.wall_list = None
+        self.foreground_list = None
+        self.background_list = None
+        self.dont_touch_list = None
+        self.enemy_list = None
+        self.flag_list = None
+        self.coin_index = None
+        self.dont_touch_index = None
+        self.background_chunks = None
+        self.wall_chunks = None
+        self.coin_chunks = None
+        self.dont_touch_chunks = None
+        self.foreground_chunks = None
+        self.enemy_swarm = None
+        self.stream = None
+        self.background = None
+        self.snapshot = None
+        self.tile_grid = None
+
+
+def map_file_name(number):
+    return f"map2_level_{number}.tmx"
+
+
+def read_map(level):
+    return load_map(map_file_name(level.number), TILE_SCALING)
+
+
+def generate_level(level):
+    if level.my_map.width > STREAM_MIN_COLUMNS:
+        start_streaming(level)
+    else:
+        generate_lists(level)
+        generate_enemies(level)
+
+
+def set_map_properties(level):
+    my_map = level.my_map
+    map_array = my_map.layers_int_data[PLATFORMS_LAYER]
+    level.end_of_map = (len(map_array[0]) - 1) * GRID_PIXEL_SIZE
+    level.background_color = my_map.backgroundcolor
+
+
+def start_streaming(level):
+    # Everything starts empty; the stream fills in the chunks around the viewport
+    set_map_properties(level)
+    level.background_list = arcade.SpriteList()
+    level.foreground_list = arcade.SpriteList()
+    level.wall_list = arcade.SpriteList()
+    level.coin_list = arcade.SpriteList()
+    level.dont_touch_list = arcade.SpriteList()
+    level.flag_list = arcade.SpriteList()
+    level.enemy_list = arcade.SpriteList()
+    level.coin_index = SpatialIndex()
+    level.dont_touch_index = SpatialIndex()
+    level.background_chunks = ChunkedLayer([])
+    level.wall_chunks = ChunkedLayer([])
+    level.coin_chunks = ChunkedLayer([])
+    level.dont_touch_chunks = ChunkedLayer([])
+    level.foreground_chunks = ChunkedLayer([])
+    level.stream = LevelStream(level)
+    level.stream.update(0, SCREEN_WIDTH)
+
+
+def generate_lists(level):
+    my_map = level.my_map
+    set_map_properties(level)
+    level.background_list = generate_sprites(my_map, BACKGROUND_LAYER, TILE_SCALING)
+    level.foreground_list = generate_sprites(my_map, FOREGROUND_LAYER, TILE_SCALING)
+    level.wall_list = generate_sprites(my_map, PLATFORMS_LAYER, TILE_SCALING)
+    level.coin_list = generate_sprites(my_map, COINS_LAYER, TILE_SCALING)
+    level.dont_touch_list = generate_sprites(my_map, DONT_TOUCH_LAYER, TILE_SCALING)
+    level.flag_list = generate_sprites(my_map, FLAGS_LAYER, TILE_SCALING)
+    level.coin_index = SpatialIndex(level.coin_list)
+    level.dont_touch_index = SpatialIndex(level.dont_touch_list)
+    level.background_chunks = ChunkedLayer(level.background_list)
+    level.wall_chunks = ChunkedLayer(level.wall_list)
+    level.coin_chunks = ChunkedLayer(level.coin_list)
+    level.dont_touch_chunks = ChunkedLayer(level.dont_touch_list)
+    level.foreground_chunks = ChunkedLayer(level.foreground_list)
+
+
+def generate_enemies(level):
+    level.enemy_list = arcade.SpriteList()
+    e_list = generate_sprites(level.my_map, ENEMIES_LAYER, ENEMY_SCALE)
+    textures = EnemyTextures()
+    for e in e_list:
+        level.enemy_list.append(spawn_enemy(e.center_x, e.center_y + 64, textures))
+    level.enemy_swarm = EnemySwarm(level.enemy_list, level.flag_list)
+
+
+def load_level(number, with_assets=True):
+    level = LoadedLevel(number)
+    level.my_map = read_map(level)
+    generate_level(level)
+    if with_assets:
+        # Streamed levels build their layers a chunk at a time, so there is nothing to bake up front
+        if BAKE_STATIC_LAYERS and level.stream is None:
+            bake_static_layers(level)
+        level.background = texture_cache.load(f"images/backgrounds/BG_{number}.png")
+    return level
+
+
+class LevelLoader:
+    def __init__(self, with_assets=True):
+        self.with_assets = with_assets
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = {}
+
+    def prefetch(self, number):
+        if number in self.pending or not os.path.exists(map_file_name(number)):
+            return
+        self.pending[number] = self.executor.submit(load_level, number, self.with_assets)
+
+    def is_ready(self, number):
+        future = self.pending.get(number)
+        return future is not None and future.done()
+
+    def take(self, number):
+        future = self.pending.pop(number, None)
+        if future is None:
+            return load_level(number, self.with_assets)
+        # Blocks if the worker hasn't finished yet, which is no worse than loading here
+        return future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,65 @@
+import numpy as np
+from enemy_swarm import EnemySwarm
+from variables import *
+
+
+class LevelSnapshot:
+    # What playing a level changes, as it was when the level was loaded. Everything else in a
+    # LoadedLevel never changes, so restoring this puts the level back without reading anything
+    def __init__(self, level):
+        self.stream = None
+        if level.stream is not None:
+            stream = level.stream
+            self.stream = (stream.coin_collected.copy(), stream.enemy_x.copy(),
+                           stream.enemy_change_x.copy(), stream.enemy_killed.copy())
+            return
+
+        self.coins = list(level.coin_list)
+        self.enemies = list(level.enemy_list)
+        self.enemy_x = np.array([enemy.center_x for enemy in self.enemies])
+        self.enemy_change_x = np.array([enemy.change_x for enemy in self.enemies])
+        self.enemy_state = np.array([enemy.state for enemy in self.enemies], dtype=np.int32)
+        self.enemy_frame = np.array([enemy.cur_texture_index for enemy in self.enemies], dtype=np.int32)
+        self.enemy_last_change_x = np.array([enemy.last_texture_change_center_x for enemy in self.enemies])
+        swarm = level.enemy_swarm
+        self.enemy_bounds = (swarm.left_bound.copy(), swarm.right_bound.copy())
+
+    def restore(self, level):
+        if self.stream is not None:
+            self.restore_stream(level)
+            return
+
+        # Rebuilt in their original order, so collisions come back in the same order as a fresh load
+        for coin in list(level.coin_list):
+            coin.kill()
+            level.coin_index.remove(coin)
+        for coin in self.coins:
+            level.coin_list.append(coin)
+            level.coin_index.add(coin)
+            level.coin_chunks.add(coin)
+        level.coin_chunks.prune()
+
+        for enemy in list(level.enemy_list):
+            enemy.kill()
+        for enemy, x, change_x, state, frame, last_change_x in zip(
+                self.enemies, self.enemy_x.tolist(), self.enemy_change_x.tolist(), self.enemy_state.tolist(),
+                self.enemy_frame.tolist(), self.enemy_last_change_x.tolist()):
+            enemy.center_x = x
+            enemy.change_x = change_x
+            enemy.state = state
+            enemy.cur_texture_index = frame
+            enemy.last_texture_change_center_x = last_change_x
+            level.enemy_list.append(enemy)
+        level.enemy_swarm = EnemySwarm(level.enemy_list, level.flag_list, self.enemy_bounds)
+
+    def restore_stream(self, level):
+        # Evicting writes the loaded chunks' state back, so the side table is reset after that
+        stream = level.stream
+        for number in list(stream.loaded):
+            stream.evict(number)
+        coin_collected, enemy_x, enemy_change_x, enemy_killed = self.stream
+        stream.coin_collected[:] = coin_collected
+        stream.enemy_x[:] = enemy_x
+        stream.enemy_change_x[:] = enemy_change_x
+        stream.enemy_killed[:] = enemy_killed
+        stream.update(0, SCREEN_WIDTH)
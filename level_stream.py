@@ -0,0 +1,167 @@
+import math
+import numpy as np
+from enemy import EnemyTextures, spawn_enemy
+from enemy_swarm import EnemySwarm, patrol_bounds
+from level_cache import tile_sprites
+from variables import *
+
+
+class StreamedChunk:
+    def __init__(self, number):
+        self.number = number
+        self.sprites = []
+        self.coins = []
+        self.enemies = []
+
+
+class LevelStream:
+    def __init__(self, level, chunk_columns: int = STREAM_CHUNK_COLUMNS, margin: float = STREAM_MARGIN):
+        my_map = level.my_map
+        self.level = level
+        self.chunk_columns = chunk_columns
+        self.chunk_width = chunk_columns * my_map.tilewidth * TILE_SCALING
+        self.margin = margin
+        self.chunk_count = math.ceil(my_map.width / chunk_columns)
+        self.loaded = {}
+
+        # Each layer's tile indices, grouped by the chunk their column falls in
+        self.layer_tiles = {}
+        for layer_name, (cols, rows, gids) in my_map.tiles.items():
+            chunk_numbers = cols // chunk_columns
+            order = np.argsort(chunk_numbers, kind="stable")
+            starts = np.searchsorted(chunk_numbers[order], np.arange(self.chunk_count + 1))
+            self.layer_tiles[layer_name] = [order[starts[i]:starts[i + 1]] for i in range(self.chunk_count)]
+
+        # The side table: everything the player can change, kept for chunks that aren't loaded
+        coin_count = len(my_map.tiles[COINS_LAYER][2]) if COINS_LAYER in my_map.tiles else 0
+        self.coin_collected = np.zeros(coin_count, dtype=bool)
+        self.enemy_textures = EnemyTextures()
+        self.setup_enemies(my_map)
+
+    def setup_enemies(self, my_map):
+        # Spawn points and patrol bounds are worked out once from short-lived tile sprites
+        spawns = tile_sprites(my_map, ENEMIES_LAYER, ENEMY_SCALE) if ENEMIES_LAYER in my_map.tiles else []
+        flags = tile_sprites(my_map, FLAGS_LAYER, TILE_SCALING) if FLAGS_LAYER in my_map.tiles else []
+        count = len(my_map.tiles[ENEMIES_LAYER][2]) if ENEMIES_LAYER in my_map.tiles else 0
+        self.enemy_x = np.zeros(count)
+        self.enemy_y = np.zeros(count)
+        self.enemy_spawned = np.zeros(count, dtype=bool)
+        for spawn in spawns:
+            self.enemy_x[spawn.tile_index] = spawn.center_x
+            self.enemy_y[spawn.tile_index] = spawn.center_y + 64
+            self.enemy_spawned[spawn.tile_index] = True
+        self.enemy_change_x = np.full(count, -ENEMY_SPEED)
+        self.enemy_killed = np.zeros(count, dtype=bool)
+
+        walk_texture = self.enemy_textures.walk_right_textures[0]
+        half_height = np.full(count, walk_texture.height * walk_texture.scale / 2)
+        self.enemy_left_bound, self.enemy_right_bound = patrol_bounds(
+            self.enemy_x, self.enemy_y, half_height,
+            np.array([flag.left for flag in flags]), np.array([flag.right for flag in flags]),
+            np.array([flag.bottom for flag in flags]), np.array([flag.top for flag in flags]))
+
+    def layer_targets(self):
+        level = self.level
+        return [(BACKGROUND_LAYER, level.background_list, level.background_chunks, None),
+                (FOREGROUND_LAYER, level.foreground_list, level.foreground_chunks, None),
+                (PLATFORMS_LAYER, level.wall_list, level.wall_chunks, None),
+                (DONT_TOUCH_LAYER, level.dont_touch_list, level.dont_touch_chunks, level.dont_touch_index),
+                (FLAGS_LAYER, level.flag_list, None, None)]
+
+    def chunk_range(self, view_left, view_right, margin):
+        first = max(math.floor((view_left - margin) / self.chunk_width), 0)
+        last = min(math.floor((view_right + margin) / self.chunk_width), self.chunk_count - 1)
+        return first, last
+
+    def update(self, view_left, view_right):
+        first, last = self.chunk_range(view_left, view_right, self.margin)
+        # Chunks are dropped a chunk further out than they are loaded, so the edge doesn't thrash
+        keep_first, keep_last = self.chunk_range(view_left, view_right, self.margin + self.chunk_width)
+        evict = [number for number in self.loaded if number < keep_first or number > keep_last]
+        load = [number for number in range(first, last + 1) if number not in self.loaded]
+        for number in evict:
+            self.evict(number)
+        for number in load:
+            self.materialize(number)
+        if evict or load:
+            self.rebuild_swarm()
+            return True
+        return False
+
+    def materialize(self, number):
+        level = self.level
+        my_map = level.my_map
+        chunk = StreamedChunk(number)
+        for layer_name, sprite_list, chunked_layer, index in self.layer_targets():
+            if layer_name not in self.layer_tiles:
+                continue
+            for sprite in tile_sprites(my_map, layer_name, TILE_SCALING, self.layer_tiles[layer_name][number]):
+                sprite_list.append(sprite)
+                if chunked_layer is not None:
+                    chunked_layer.add(sprite)
+                if index is not None:
+                    index.add(sprite)
+                chunk.sprites.append((sprite, index))
+
+        if COINS_LAYER in self.layer_tiles:
+            coins = self.layer_tiles[COINS_LAYER][number]
+            coins = coins[~self.coin_collected[coins]]
+            for coin in tile_sprites(my_map, COINS_LAYER, TILE_SCALING, coins):
+                level.coin_list.append(coin)
+                level.coin_chunks.add(coin)
+                level.coin_index.add(coin)
+                chunk.coins.append(coin)
+
+        if ENEMIES_LAYER in self.layer_tiles:
+            for i in self.layer_tiles[ENEMIES_LAYER][number].tolist():
+                if self.enemy_killed[i] or not self.enemy_spawned[i]:
+                    continue
+                enemy = spawn_enemy(float(self.enemy_x[i]), float(self.enemy_y[i]), self.enemy_textures)
+                enemy.change_x = float(self.enemy_change_x[i])
+                enemy.stream_index = i
+                level.enemy_list.append(enemy)
+                chunk.enemies.append(enemy)
+        self.loaded[number] = chunk
+
+    def evict(self, number):
+        level = self.level
+        chunk = self.loaded.pop(number)
+        for sprite, index in chunk.sprites:
+            sprite.kill()
+            if index is not None:
+                index.remove(sprite)
+        for coin in chunk.coins:
+            # Picking a coin up takes it out of the index, so whatever is missing was collected
+            if coin not in level.coin_index:
+                self.coin_collected[coin.tile_index] = True
+            else:
+                level.coin_index.remove(coin)
+            coin.kill()
+        for enemy in chunk.enemies:
+            i = enemy.stream_index
+            if not enemy.sprite_lists:
+                self.enemy_killed[i] = True
+            else:
+                self.enemy_x[i] = enemy.center_x
+                self.enemy_change_x[i] = enemy.change_x
+                enemy.kill()
+        for chunked_layer in (level.background_chunks, level.foreground_chunks, level.wall_chunks,
+                              level.dont_touch_chunks, level.coin_chunks):
+            chunked_layer.prune()
+
+    def loaded_columns(self):
+        if not self.loaded:
+            return 0, -1
+        return min(self.loaded) * self.chunk_columns, (max(self.loaded) + 1) * self.chunk_columns - 1
+
+    def rebuild_swarm(self):
+        enemies = list(self.level.enemy_list)
+        indices = [enemy.stream_index for enemy in enemies]
+        bounds = (self.enemy_left_bound[indices], self.enemy_right_bound[indices])
+        self.level.enemy_swarm = EnemySwarm(self.level.enemy_list, self.level.flag_list, bounds)
+
+    def stats(self):
+        return {"chunks": self.chunk_count,
+                "loaded": sorted(self.loaded),
+                "coins_collected": int(self.coin_collected.sum()),
+                "zombies_killed": int(self.enemy_killed.sum())}
@@ -0,0 +1,322 @@
+import argparse
+import glob
+import json
+import os
+import timeit
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pyglet
+
+# Validating a map never draws anything, so keep pyglet from creating its hidden window
+pyglet.options["shadow_window"] = False
+
+import numpy as np
+from level_cache import load_map, tile_positions
+from enemy_swarm import patrol_bounds
+from texture_cache import texture_cache, set_headless
+from variables import *
+
+
+class JumpArc:
+    # The platformer physics step by step: gravity first, then the move. Walking into a wall lifts
+    # the player up to MOVEMENT_SPEED pixels to "run up a ramp", so a ledge that high above the feet
+    # still counts as landed on
+    def __init__(self, player_width, player_height):
+        self.player_width = player_width
+        self.player_height = player_height
+        self.heights = [0]
+        change_y = JUMP_SPEED
+        while change_y > 0 or self.heights[-1] > -SCREEN_HEIGHT * 4:
+            change_y -= GRAVITY
+            self.heights.append(self.heights[-1] + change_y)
+        self.apex = max(self.heights)
+        self.apex_tick = self.heights.index(self.apex)
+
+    def air_ticks(self, rise):
+        # Ticks in the air before the feet land on something `rise` pixels above the take off
+        rise -= MOVEMENT_SPEED
+        if rise > self.apex:
+            return None
+        for tick in range(self.apex_tick, len(self.heights)):
+            if self.heights[tick] <= rise:
+                return tick
+        return len(self.heights) - 1
+
+    def travel(self, rise):
+        ticks = self.air_ticks(rise)
+        if ticks is None:
+            return None
+        return ticks * MOVEMENT_SPEED
+
+    def reach(self, rise):
+        # How far sideways a landing spot can be, counting the overhang at take off and landing
+        # since the feet only need to overlap a platform's edge
+        travel = self.travel(rise)
+        if travel is None:
+            return None
+        return travel + self.player_width
+
+
+class LevelGrid:
+    def __init__(self, compiled):
+        self.width = compiled.width
+        self.height = compiled.height
+        self.compiled = compiled
+        self.solid = self.layer(PLATFORMS_LAYER) != 0
+        self.hazard = self.layer(DONT_TOUCH_LAYER) != 0
+        self.end_of_map = (self.width - 1) * GRID_PIXEL_SIZE
+
+    def layer(self, name):
+        grid = self.compiled.layers_int_data.get(name)
+        if grid is None:
+            return np.zeros((self.height, self.width), dtype=np.uint32)
+        return np.asarray(grid)
+
+    def cells(self, name):
+        if name not in self.compiled.tiles:
+            return []
+        cols, rows, _ = self.compiled.tiles[name]
+        return list(zip(cols.tolist(), rows.tolist()))
+
+    def standable(self, body_cells):
+        # Cells a player body_cells tall can stand in: free of walls and hazards, on top of a wall
+        free = ~self.solid & ~self.hazard
+        stand = np.zeros_like(free)
+        stand[:-1] = free[:-1] & self.solid[1:]
+        for above in range(1, body_cells):
+            stand[above:] &= free[:-above]
+            stand[:above] = False
+        return stand
+
+    # Tiles are placed with their right edge on their column's grid line, as arcade.generate_sprites does
+    def column_at(self, x):
+        return int(x // GRID_PIXEL_SIZE) + 1
+
+    def row_at(self, y):
+        return self.height - 1 - int(y // GRID_PIXEL_SIZE)
+
+    def bottom_of(self, row):
+        return (self.height - 1 - row) * GRID_PIXEL_SIZE
+
+
+def player_size():
+    texture = texture_cache.load(PLAYER_STAND_FRAMES[0], CHARACTER_SCALING)
+    return texture.width * CHARACTER_SCALING, texture.height * CHARACTER_SCALING
+
+
+def enemy_half_height():
+    texture = texture_cache.load(ENEMY_WALK_FRAMES[0], ENEMY_SCALE)
+    return texture.height * ENEMY_SCALE / 2
+
+
+def start_cell(grid, stand):
+    # Where the player settles after spawning: pushed up out of any wall, then falling onto the ground
+    col = grid.column_at(PLAYER_START_X)
+    row = grid.row_at(PLAYER_START_Y - GRID_PIXEL_SIZE / 2)
+    if not 0 <= col < grid.width:
+        return None
+    row = min(max(row, 0), grid.height - 1)
+    while row > 0 and grid.solid[row, col]:
+        row -= 1
+    while row < grid.height:
+        if stand[row, col]:
+            return col, row
+        if grid.solid[row, col] or grid.hazard[row, col]:
+            return None
+        row += 1
+    return None
+
+
+def reachable_cells(grid, stand, arc, start):
+    stand_by_column = [np.flatnonzero(stand[:, col]).tolist() for col in range(grid.width)]
+    max_columns = int(arc.reach(-grid.height * GRID_PIXEL_SIZE) // GRID_PIXEL_SIZE) + 1
+    reached = {start}
+    queue = deque([start])
+    while queue:
+        col, row = queue.popleft()
+        bottom = grid.bottom_of(row)
+        for other_col in range(max(col - max_columns, 0), min(col + max_columns + 1, grid.width)):
+            gap = max(abs(other_col - col) - 1, 0) * GRID_PIXEL_SIZE
+            for other_row in stand_by_column[other_col]:
+                cell = (other_col, other_row)
+                if cell in reached:
+                    continue
+                reach = arc.reach(grid.bottom_of(other_row) - bottom)
+                if reach is not None and gap < reach:
+                    reached.add(cell)
+                    queue.append(cell)
+    return reached
+
+
+def touchable(grid, arc, reached, cell):
+    # A tile is collected when any part of the body passes through it, so the head counts too
+    col, row = cell
+    tile_bottom = grid.bottom_of(row)
+    for stand_col, stand_row in reached:
+        rise = tile_bottom - arc.player_height - grid.bottom_of(stand_row)
+        if tile_bottom + GRID_PIXEL_SIZE <= grid.bottom_of(stand_row):
+            continue
+        reach = arc.reach(max(rise, 0))
+        gap = max(abs(col - stand_col) - 1, 0) * GRID_PIXEL_SIZE
+        if reach is not None and gap < reach:
+            return True
+    return False
+
+
+def unbounded_enemies(grid, compiled):
+    if ENEMIES_LAYER not in compiled.tiles:
+        return []
+    rights, tops, _ = tile_positions(compiled, ENEMIES_LAYER, ENEMY_SCALE)
+    # Zombies spawn one tile up from their marker, as level_loader.generate_enemies does
+    x = np.array(rights) - GRID_PIXEL_SIZE / 2
+    y = np.array(tops) - GRID_PIXEL_SIZE / 2 + 64
+    half_height = np.full(len(x), enemy_half_height())
+    if FLAGS_LAYER in compiled.tiles:
+        flag_rights, flag_tops, _ = tile_positions(compiled, FLAGS_LAYER, TILE_SCALING)
+    else:
+        flag_rights, flag_tops = [], []
+    flag_right = np.array(flag_rights, dtype=np.float64)
+    flag_top = np.array(flag_tops, dtype=np.float64)
+    left_bound, right_bound = patrol_bounds(x, y, half_height, flag_right - GRID_PIXEL_SIZE, flag_right,
+                                            flag_top - GRID_PIXEL_SIZE, flag_top)
+    unbounded = []
+    for cell, left, right in zip(grid.cells(ENEMIES_LAYER), left_bound.tolist(), right_bound.tolist()):
+        missing = [side for side, bound in (("left", left), ("right", right)) if np.isinf(bound)]
+        if missing:
+            unbounded.append({"cell": list(cell), "missing": missing})
+    return unbounded
+
+
+def end_reachable(grid, arc, reached):
+    # The level ends when the player's centre passes end_of_map, even mid fall, as long as it
+    # hasn't dropped low enough to be sent back to the start
+    for col, row in reached:
+        fall = arc.travel(100 - arc.player_height / 2 - grid.bottom_of(row)) or 0
+        if col * GRID_PIXEL_SIZE + arc.player_width / 2 + fall >= grid.end_of_map:
+            return True
+    return False
+
+
+def impossible_jumps(grid, stand, reached):
+    # The first standable cells past the furthest point the player can get to
+    furthest = max(col for col, _ in reached)
+    for col in range(furthest + 1, grid.width):
+        rows = np.flatnonzero(stand[:, col]).tolist()
+        if rows:
+            take_offs = [row for reach_col, row in reached if reach_col == furthest]
+            return [{"from": [furthest, take_off], "to": [col, row],
+                     "gap": col - furthest - 1, "rise": take_off - row}
+                    for take_off in take_offs for row in rows]
+    return []
+
+
+def validate_level(tmx_file):
+    start_time = timeit.default_timer()
+    compiled = load_map(tmx_file, TILE_SCALING)
+    grid = LevelGrid(compiled)
+    player_width, player_height = player_size()
+    arc = JumpArc(player_width, player_height)
+    body_cells = int(np.ceil(player_height / GRID_PIXEL_SIZE))
+    stand = grid.standable(body_cells)
+
+    report = {"level": os.path.basename(tmx_file),
+              "width": grid.width,
+              "height": grid.height,
+              "jump_height": arc.apex,
+              "jump_distance": arc.reach(0)}
+    start = start_cell(grid, stand)
+    reached = reachable_cells(grid, stand, arc, start) if start is not None else set()
+    coins = grid.cells(COINS_LAYER)
+    flags = grid.cells(FLAGS_LAYER)
+
+    report["start"] = list(start) if start is not None else None
+    report["standable_cells"] = int(stand.sum())
+    report["reachable_cells"] = len(reached)
+    report["end_reachable"] = end_reachable(grid, arc, reached)
+    report["impossible_jumps"] = [] if report["end_reachable"] or not reached \
+        else impossible_jumps(grid, stand, reached)
+    report["coins_in_walls"] = [list(cell) for cell in coins if grid.solid[cell[1], cell[0]]]
+    report["unreachable_coins"] = [list(cell) for cell in coins if list(cell) not in report["coins_in_walls"]
+                                   and not touchable(grid, arc, reached, cell)]
+    report["unreachable_flags"] = [list(cell) for cell in flags if not touchable(grid, arc, reached, cell)]
+    report["unbounded_zombies"] = unbounded_enemies(grid, compiled)
+    report["problems"] = (int(start is None) + int(not report["end_reachable"])
+                          + len(report["coins_in_walls"]) + len(report["unreachable_coins"])
+                          + len(report["unreachable_flags"]) + len(report["unbounded_zombies"]))
+    report["time"] = timeit.default_timer() - start_time
+    return report
+
+
+def init_worker():
+    set_headless()
+
+
+def level_files(directory):
+    def level_number(file_name):
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        suffix = name.rsplit("_", 1)[-1]
+        return (int(suffix), name) if suffix.isdigit() else (float("inf"), name)
+    return sorted(glob.glob(os.path.join(directory, "map2_level_*.tmx")), key=level_number)
+
+
+def validate_levels(tmx_files, jobs=None):
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as executor:
+        return list(executor.map(validate_level, tmx_files, chunksize=max(len(tmx_files) // 32, 1)))
+
+
+def write_reports(reports, output_directory):
+    os.makedirs(output_directory, exist_ok=True)
+    for report in reports:
+        name = os.path.splitext(report["level"])[0]
+        with open(os.path.join(output_directory, name + ".json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def summary(report):
+    if not report["problems"]:
+        return f"{report['level']}: ok"
+    lines = [f"{report['level']}: {report['problems']} problem(s)"]
+    if report["start"] is None:
+        lines.append("  player start is not above any ground")
+    elif not report["end_reachable"]:
+        lines.append("  end of the map can't be reached")
+    for jump in report["impossible_jumps"]:
+        lines.append(f"  impossible jump from {jump['from']} to {jump['to']} "
+                     f"(gap {jump['gap']}, rise {jump['rise']} tiles)")
+    for cell in report["coins_in_walls"]:
+        lines.append(f"  coin inside a wall at {cell}")
+    for cell in report["unreachable_coins"]:
+        lines.append(f"  unreachable coin at {cell}")
+    for cell in report["unreachable_flags"]:
+        lines.append(f"  unreachable flag at {cell}")
+    for zombie in report["unbounded_zombies"]:
+        lines.append(f"  zombie at {zombie['cell']} has no flag on its {' or '.join(zombie['missing'])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check levels for unreachable goals and broken zombie patrols.")
+    parser.add_argument("directory", nargs="?", help="directory holding the map2_level_*.tmx files, the game's by default")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument("--output", help="directory for the per level reports")
+    args = parser.parse_args()
+    # Paths given on the command line are relative to where it was run, not to the game
+    directory = os.path.abspath(args.directory) if args.directory else "."
+    output = os.path.abspath(args.output) if args.output else VALIDATION_REPORT_DIRECTORY
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    tmx_files = level_files(directory)
+    start_time = timeit.default_timer()
+    reports = validate_levels(tmx_files, args.jobs)
+    total_time = timeit.default_timer() - start_time
+    write_reports(reports, output)
+    for report in reports:
+        print(summary(report))
+    broken = sum(1 for report in reports if report["problems"])
+    print(f"Validated {len(reports)} levels in {total_time:.2f}s, {broken} with problems. "
+          f"Reports written to {output}")
+    return 1 if broken else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,567 @@
+import argparse
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+import timeit
+import zlib
+import numpy as np
+from simulation import World
+from texture_cache import set_headless
+from level_loader import LevelLoader
+from commands import COMMAND_TYPES
+from variables import *
+
+# magic, level, input delay
+HELLO = struct.Struct("<4sIB")
+# packet type, payload length
+FRAME = struct.Struct("<BI")
+TICK = struct.Struct("<I")
+CHECKSUM = struct.Struct("<I")
+# level, score, players, zombies, bullets, coins, delta
+SNAPSHOT_HEADER = struct.Struct("<IIHHHH?")
+
+COMMANDS_PACKET = 1
+HASH_PACKET = 2
+SNAPSHOT_PACKET = 3
+PACKET_NAMES = {COMMANDS_PACKET: "commands", HASH_PACKET: "hashes", SNAPSHOT_PACKET: "snapshots"}
+
+
+class TwoPlayerWorld(World):
+    # Player one drives the camera and the level change; player two plays alongside
+    def __init__(self, level_loader=None):
+        super().__init__(level_loader)
+        self.partner = None
+
+    def setup_player(self):
+        super().setup_player()
+        self.partner = self.create_player()
+        self.partner.color = PARTNER_COLOR
+        # Both players fire from one pool, so their bullets are culled, drawn and hit zombies together
+        self.partner.bullet_pool = self.player.bullet_pool
+        self.partner.bullet_list = self.player.bullet_list
+        self.players = [self.player, self.partner]
+
+    def execute_for(self, index, command):
+        command.execute(self.players[index])
+
+    def step(self):
+        if self.completed:
+            return
+        self.partner.physics_engine.update()
+        super().step()
+
+    def update_player(self):
+        level = self.level
+        changed_viewport = super().update_player()
+        if self.level == level and not self.completed:
+            self.update_partner()
+        return changed_viewport
+
+    def update_partner(self):
+        partner = self.partner
+        self.collect_coins(partner)
+        if self.enemy_broadphase.query(partner) or partner.center_y < 100 \
+                or self.dont_touch_index.check_for_collision(partner):
+            # Back in next to player one, rather than at the start where the camera may not be
+            partner.center_x = self.player.center_x
+            partner.center_y = self.player.center_y
+            self.events.append(GAME_OVER_EVENT)
+
+
+def quantize(values):
+    return np.round(np.asarray(values, dtype=np.float64) * LOCKSTEP_POSITION_SCALE).astype(np.int32)
+
+
+def dequantize(values):
+    return (values / LOCKSTEP_POSITION_SCALE).tolist()
+
+
+def coin_mask(world):
+    loaded_level = world.loaded_level
+    tiles = loaded_level.my_map.tiles
+    stream = loaded_level.stream
+    if stream is not None:
+        remaining = ~stream.coin_collected
+        for chunk in stream.loaded.values():
+            for coin in chunk.coins:
+                remaining[coin.tile_index] = coin in world.coin_index
+        return remaining
+    remaining = np.zeros(len(tiles[COINS_LAYER][2]) if COINS_LAYER in tiles else 0, dtype=bool)
+    remaining[[coin.tile_index for coin in world.coin_list]] = True
+    return remaining
+
+
+class Snapshot:
+    def __init__(self):
+        self.level = 0
+        self.score = 0
+        self.players = np.zeros((0, 5), dtype=np.int32)
+        self.enemy_x = np.zeros(0, dtype=np.int32)
+        self.enemy_change_x = np.zeros(0, dtype=np.int32)
+        self.enemy_alive = np.zeros(0, dtype=np.uint8)
+        self.bullets = np.zeros((0, 4), dtype=np.int32)
+        self.coin_count = 0
+        self.coins = np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def capture(cls, world):
+        snapshot = cls()
+        snapshot.level = world.level
+        snapshot.score = world.score
+        snapshot.players = np.column_stack([
+            quantize([[player.center_x, player.center_y, player.change_x, player.change_y]
+                      for player in world.players]).reshape(-1, 4),
+            np.array([player.state for player in world.players], dtype=np.int32)])
+        swarm = world.enemy_swarm
+        snapshot.enemy_x = quantize(swarm.x)
+        snapshot.enemy_change_x = quantize(swarm.change_x)
+        snapshot.enemy_alive = swarm.alive.astype(np.uint8)
+        bullets = list(world.bullet_list)
+        snapshot.bullets = np.column_stack([
+            quantize([[bullet.center_x, bullet.center_y, bullet.change_x] for bullet in bullets]).reshape(-1, 3),
+            np.array([bullet.age for bullet in bullets], dtype=np.int32)])
+        remaining = coin_mask(world)
+        snapshot.coin_count = len(remaining)
+        snapshot.coins = np.packbits(remaining)
+        return snapshot
+
+    def fields(self):
+        return [self.players, self.enemy_x, self.enemy_change_x, self.enemy_alive, self.bullets, self.coins]
+
+    def counts(self):
+        return len(self.players), len(self.enemy_x), len(self.bullets), self.coin_count
+
+    def checksum(self):
+        checksum = zlib.crc32(struct.pack("<II", self.level, self.score))
+        for field in self.fields():
+            checksum = zlib.crc32(field.tobytes(), checksum)
+        return checksum
+
+    def encode(self, baseline=None):
+        # Against the last snapshot the other side has, most fields barely change; the byte planes
+        # of what's left are split apart so the mostly zero high bytes compress away
+        delta = baseline is not None and baseline.counts() == self.counts()
+        planes = []
+        for i, field in enumerate(self.fields()):
+            if delta:
+                base = baseline.fields()[i]
+                field = field ^ base if field.dtype == np.uint8 else field - base
+            planes.append(field.view(np.uint8).reshape(-1, field.dtype.itemsize).T.tobytes())
+        header = SNAPSHOT_HEADER.pack(self.level, self.score, *self.counts(), delta)
+        return header + zlib.compress(b"".join(planes))
+
+    @classmethod
+    def decode(cls, data, baseline=None):
+        level, score, player_count, enemy_count, bullet_count, coin_count, delta = \
+            SNAPSHOT_HEADER.unpack_from(data)
+        body = zlib.decompress(data[SNAPSHOT_HEADER.size:])
+        snapshot = cls()
+        snapshot.level = level
+        snapshot.score = score
+        snapshot.coin_count = coin_count
+        shapes = [((player_count, 5), np.int32), ((enemy_count,), np.int32), ((enemy_count,), np.int32),
+                  ((enemy_count,), np.uint8), ((bullet_count, 4), np.int32), (((coin_count + 7) // 8,), np.uint8)]
+        fields = []
+        offset = 0
+        for i, (shape, dtype) in enumerate(shapes):
+            itemsize = np.dtype(dtype).itemsize
+            count = int(np.prod(shape))
+            planes = np.frombuffer(body, dtype=np.uint8, count=count * itemsize, offset=offset)
+            field = planes.reshape(itemsize, count).T.copy().view(dtype).reshape(shape)
+            if delta:
+                base = baseline.fields()[i]
+                field = field ^ base if dtype == np.uint8 else field + base
+            fields.append(field)
+            offset += count * itemsize
+        (snapshot.players, snapshot.enemy_x, snapshot.enemy_change_x, snapshot.enemy_alive,
+         snapshot.bullets, snapshot.coins) = fields
+        return snapshot
+
+    def apply(self, world):
+        # Puts a drifted world back in line with the host's. A coin picked up only on this side
+        # can't be put back, so coins are only ever taken away
+        if world.level != self.level or (len(world.players), len(world.enemy_swarm.x)) != self.counts()[:2]:
+            return False
+        world.score = self.score
+        motion = (self.players[:, :4] / LOCKSTEP_POSITION_SCALE).tolist()
+        for player, (x, y, change_x, change_y), state in zip(world.players, motion, self.players[:, 4].tolist()):
+            player.center_x = x
+            player.center_y = y
+            player.change_x = change_x
+            player.change_y = change_y
+            player.state = state
+
+        swarm = world.enemy_swarm
+        swarm.x = self.enemy_x / LOCKSTEP_POSITION_SCALE
+        swarm.change_x = self.enemy_change_x / LOCKSTEP_POSITION_SCALE
+        alive = self.enemy_alive.astype(bool)
+        revived = bool((alive & ~swarm.alive).any())
+        for i, (x, change_x) in enumerate(zip(swarm.x.tolist(), swarm.change_x.tolist())):
+            sprite = swarm.sprites[i]
+            sprite.center_x = x
+            sprite.change_x = change_x
+            if swarm.alive[i] and not alive[i]:
+                sprite.kill()
+        swarm.alive = alive
+        if revived:
+            # A zombie only shot on this side comes back in its old place in the list, so the two sides
+            # keep finding collisions in the same order
+            for sprite in list(world.enemy_list):
+                sprite.kill()
+            for i in np.flatnonzero(alive).tolist():
+                world.enemy_list.append(swarm.sprites[i])
+
+        bullet_pool = world.player.bullet_pool
+        bullet_pool.clear()
+        for x, y, change_x, age in zip(dequantize(self.bullets[:, 0]), dequantize(self.bullets[:, 1]),
+                                       dequantize(self.bullets[:, 2]), self.bullets[:, 3].tolist()):
+            bullet = bullet_pool.acquire()
+            bullet.angle = -90 if change_x > 0 else 90
+            bullet.change_x = change_x
+            bullet.center_x = x
+            bullet.center_y = y
+            bullet.age = age
+
+        remaining = np.unpackbits(self.coins, count=self.coin_count).astype(bool)
+        for coin in list(world.coin_list):
+            if not remaining[coin.tile_index]:
+                coin.kill()
+                world.coin_index.remove(coin)
+        stream = world.loaded_level.stream
+        if stream is not None:
+            stream.coin_collected |= ~remaining
+        return True
+
+
+class LockstepPeer:
+    def __init__(self, world, connection, index, input_delay=LOCKSTEP_INPUT_DELAY):
+        self.world = world
+        self.connection = connection
+        self.connection.setblocking(False)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.index = index
+        self.remote = 1 - index
+        self.input_delay = input_delay
+        self.tick = 0
+        self.commands = {code: command_type() for code, command_type in COMMAND_TYPES.items()}
+
+        # Command codes per player per tick; nobody can have pressed anything in the first few ticks
+        self.pending = bytearray()
+        self.inputs = [{tick: b"" for tick in range(input_delay)} for _ in range(2)]
+        self.sent_tick = input_delay - 1
+        self.input_times = {}
+
+        self.local_hashes = {}
+        self.remote_hashes = {}
+        self.snapshot = None
+        self.remote_snapshots = {}
+        self.local_snapshots = {}
+        self.history = {}
+
+        self.receive_buffer = bytearray()
+        self.send_buffer = bytearray()
+        self.bytes_sent = {name: 0 for name in PACKET_NAMES.values()}
+        self.bytes_received = 0
+        self.snapshot_sizes = []
+        self.latencies = []
+        self.stalls = []
+        self.stall_start = None
+        self.desync_ticks = []
+        self.corrections = 0
+
+    def execute(self, command):
+        self.pending.append(command.code)
+
+    def send(self, packet_type, payload):
+        packet = FRAME.pack(packet_type, len(payload)) + payload
+        self.bytes_sent[PACKET_NAMES[packet_type]] += len(packet)
+        self.send_buffer += packet
+
+    def flush(self):
+        while self.send_buffer:
+            try:
+                sent = self.connection.send(self.send_buffer)
+            except BlockingIOError:
+                return
+            del self.send_buffer[:sent]
+
+    def poll(self, timeout=0):
+        self.flush()
+        readable, _, _ = select.select([self.connection], [], [], timeout)
+        if not readable:
+            return
+        while True:
+            try:
+                data = self.connection.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                raise ConnectionError("The other player disconnected")
+            self.bytes_received += len(data)
+            self.receive_buffer += data
+        buffer = self.receive_buffer
+        while len(buffer) >= FRAME.size:
+            packet_type, length = FRAME.unpack_from(buffer)
+            if len(buffer) < FRAME.size + length:
+                break
+            payload = bytes(buffer[FRAME.size:FRAME.size + length])
+            del buffer[:FRAME.size + length]
+            self.handle(packet_type, payload)
+
+    def handle(self, packet_type, payload):
+        tick, = TICK.unpack_from(payload)
+        if packet_type == COMMANDS_PACKET:
+            self.inputs[self.remote][tick] = payload[TICK.size:]
+        elif packet_type == HASH_PACKET:
+            self.remote_hashes[tick], = CHECKSUM.unpack_from(payload, TICK.size)
+            self.check_hash(tick)
+        elif packet_type == SNAPSHOT_PACKET:
+            self.snapshot = Snapshot.decode(payload[TICK.size:], self.snapshot)
+            self.remote_snapshots[tick] = self.snapshot
+            self.check_snapshot()
+
+    def send_inputs(self):
+        # Whatever was pressed since the last tick is played on both sides input_delay ticks from now
+        target = self.tick + self.input_delay
+        if target <= self.sent_tick:
+            return
+        codes = bytes(self.pending)
+        self.pending.clear()
+        self.inputs[self.index][target] = codes
+        if codes:
+            self.input_times[target] = timeit.default_timer()
+        self.send(COMMANDS_PACKET, TICK.pack(target) + codes)
+        self.sent_tick = target
+
+    def ready(self):
+        return self.tick in self.inputs[self.remote]
+
+    def step(self, timeout=0):
+        start_time = timeit.default_timer()
+        self.send_inputs()
+        self.poll(0)
+        while not self.ready():
+            remaining = start_time + timeout - timeit.default_timer()
+            if remaining <= 0:
+                if self.stall_start is None:
+                    self.stall_start = start_time
+                return False
+            self.poll(remaining)
+        now = timeit.default_timer()
+        if self.stall_start is not None or now - start_time > 0.001:
+            self.stalls.append(now - (self.stall_start or start_time))
+            self.stall_start = None
+
+        world = self.world
+        codes = [self.inputs[index].pop(self.tick) for index in (0, 1)]
+        if self.index != 0:
+            # Kept until the host's snapshot from before this tick is checked, to play again after a correction
+            self.history[self.tick] = codes
+        self.play(codes)
+        input_time = self.input_times.pop(self.tick, None)
+        if input_time is not None:
+            self.latencies.append(now - input_time)
+        world.step()
+        self.tick += 1
+
+        if self.tick % LOCKSTEP_HASH_INTERVAL == 0:
+            self.local_hashes[self.tick] = Snapshot.capture(world).checksum()
+            self.send(HASH_PACKET, TICK.pack(self.tick) + CHECKSUM.pack(self.local_hashes[self.tick]))
+            self.check_hash(self.tick)
+        if self.tick % LOCKSTEP_SNAPSHOT_INTERVAL == 0:
+            if self.index == 0:
+                snapshot = Snapshot.capture(world)
+                payload = TICK.pack(self.tick) + snapshot.encode(self.snapshot)
+                self.snapshot_sizes.append(FRAME.size + len(payload))
+                self.send(SNAPSHOT_PACKET, payload)
+                self.snapshot = snapshot
+            else:
+                # Compared with the host's once that arrives, so the guest never waits on it
+                self.local_snapshots[self.tick] = Snapshot.capture(world)
+                self.check_snapshot()
+        self.flush()
+        return True
+
+    def play(self, codes):
+        for index, player_codes in enumerate(codes):
+            for code in player_codes:
+                self.world.execute_for(index, self.commands[code])
+
+    def check_hash(self, tick):
+        if tick in self.local_hashes and tick in self.remote_hashes:
+            if self.local_hashes.pop(tick) != self.remote_hashes.pop(tick):
+                self.desync_ticks.append(tick)
+
+    def check_snapshot(self):
+        for tick in sorted(self.remote_snapshots):
+            local = self.local_snapshots.pop(tick, None)
+            if local is None:
+                return
+            snapshot = self.remote_snapshots.pop(tick)
+            if local.checksum() != snapshot.checksum() and self.correct(tick, snapshot):
+                self.corrections += 1
+            for old_tick in [old_tick for old_tick in self.history if old_tick < tick]:
+                del self.history[old_tick]
+
+    def correct(self, tick, snapshot):
+        # The snapshot is from a few ticks back, so the world is put back to it and those ticks played again
+        world = self.world
+        if not snapshot.apply(world):
+            return False
+        events = len(world.events)
+        for replay_tick in range(tick, self.tick):
+            self.play(self.history[replay_tick])
+            world.step()
+        # Their sounds already played the first time round, but a level change still has to reach the window
+        world.events[events:] = [event for event in world.events[events:] if event == LEVEL_EVENT]
+        return True
+
+    def close(self):
+        # The other side may already be gone, in which case whatever is left to send is dropped
+        try:
+            self.connection.setblocking(True)
+            self.flush()
+        except OSError:
+            pass
+        finally:
+            self.connection.close()
+
+    def stats(self, ticks=None):
+        seconds = (self.tick if ticks is None else ticks) / SIMULATION_RATE
+        return {"ticks": self.tick,
+                "bytes_sent_per_second": {name: sent / seconds for name, sent in self.bytes_sent.items()},
+                "total_bytes_sent_per_second": sum(self.bytes_sent.values()) / seconds,
+                "mean_snapshot_bytes": float(np.mean(self.snapshot_sizes)) if self.snapshot_sizes else None,
+                "input_latency_ms": percentiles(self.latencies),
+                "stalls": len(self.stalls),
+                "stall_ms": percentiles(self.stalls),
+                "desync_ticks": list(self.desync_ticks),
+                "corrections": self.corrections}
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    p50, p99 = np.percentile(np.array(samples) * 1000, [50, 99]).tolist()
+    return {"p50": p50, "p99": p99}
+
+
+def host(port=LOCKSTEP_PORT, level=START_LEVEL, input_delay=LOCKSTEP_INPUT_DELAY):
+    with socket.create_server(("", port)) as server:
+        connection, _ = server.accept()
+    connection.sendall(HELLO.pack(LOCKSTEP_MAGIC, level, input_delay))
+    return connection, level, input_delay
+
+
+def join(address):
+    host_name, _, port = address.partition(":")
+    connection = socket.create_connection((host_name or "localhost", int(port or LOCKSTEP_PORT)),
+                                          timeout=LOCKSTEP_TIMEOUT)
+    hello = b""
+    while len(hello) < HELLO.size:
+        data = connection.recv(HELLO.size - len(hello))
+        if not data:
+            raise ConnectionError("The host closed the connection")
+        hello += data
+    magic, level, input_delay = HELLO.unpack(hello)
+    if magic != LOCKSTEP_MAGIC:
+        raise ValueError(f"{address} is not a Kayzee host")
+    return connection, level, input_delay
+
+
+def run_peer(peer, ticks, seed, realtime, nudge_tick=None):
+    # A player mashing keys at random, a few presses a second
+    rng = random.Random(seed)
+    commands = [command_type() for command_type in COMMAND_TYPES.values()]
+    next_time = timeit.default_timer()
+    while peer.tick < ticks:
+        if rng.random() < 0.08:
+            peer.execute(rng.choice(commands))
+        if not peer.step(LOCKSTEP_TIMEOUT):
+            raise TimeoutError(f"Player {peer.index + 1} waited too long at tick {peer.tick}")
+        if peer.tick == nudge_tick:
+            peer.world.enemy_swarm.x += 1
+        if realtime:
+            next_time += 1 / SIMULATION_RATE
+            time.sleep(max(next_time - timeit.default_timer(), 0))
+    peer.flush()
+
+
+def loopback(level, ticks, realtime=False, scale=1, nudge_tick=None, input_delay=LOCKSTEP_INPUT_DELAY):
+    set_headless()
+    if scale == 1:
+        loaders = [LevelLoader(with_assets=False), LevelLoader(with_assets=False)]
+    else:
+        from benchmark import BenchmarkLevelLoader
+        loaders = [BenchmarkLevelLoader(scale), BenchmarkLevelLoader(scale)]
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        guest_connection = socket.create_connection(server.getsockname())
+        host_connection, _ = server.accept()
+    peers = []
+    for index, (connection, loader) in enumerate(zip((host_connection, guest_connection), loaders)):
+        world = TwoPlayerWorld(loader)
+        world.setup(level)
+        peers.append(LockstepPeer(world, connection, index, input_delay))
+
+    errors = []
+
+    def run(peer, seed, nudge):
+        try:
+            run_peer(peer, ticks, seed, realtime, nudge)
+        except Exception as e:
+            errors.append(e)
+
+    # Only the guest is nudged, so the host's snapshots have something to put right
+    threads = [threading.Thread(target=run, args=(peers[0], 1, None)),
+               threading.Thread(target=run, args=(peers[1], 2, nudge_tick))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for peer in peers:
+        peer.close()
+    if errors:
+        raise errors[0]
+    return peers
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Run two lockstep peers against each other over a local socket.")
+    parser.add_argument("--level", type=int, default=START_LEVEL)
+    parser.add_argument("--ticks", type=int, default=1200)
+    parser.add_argument("--realtime", action="store_true", help="pace both peers at the simulation rate")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="repeat the level side by side this many times, for more zombies")
+    parser.add_argument("--nudge", type=int, default=None, metavar="TICK",
+                        help="knock the guest's zombies out of step at this tick")
+    parser.add_argument("--input-delay", type=int, default=LOCKSTEP_INPUT_DELAY)
+    args = parser.parse_args()
+
+    start_time = timeit.default_timer()
+    host_peer, guest_peer = loopback(args.level, args.ticks, args.realtime, args.scale, args.nudge,
+                                     args.input_delay)
+    total_time = timeit.default_timer() - start_time
+    in_sync = Snapshot.capture(host_peer.world).checksum() == Snapshot.capture(guest_peer.world).checksum()
+    print(f"{args.ticks} ticks in {total_time:.2f}s, {len(host_peer.world.enemy_swarm)} zombies, "
+          f"{'in sync' if in_sync else 'OUT OF SYNC'} at the end")
+    for name, peer in (("host", host_peer), ("guest", guest_peer)):
+        stats = peer.stats()
+        sent = ", ".join(f"{kind} {rate:.0f}" for kind, rate in stats["bytes_sent_per_second"].items())
+        print(f"{name}: {stats['total_bytes_sent_per_second']:.0f} B/s sent ({sent})")
+        if stats["mean_snapshot_bytes"] is not None:
+            print(f"  snapshots average {stats['mean_snapshot_bytes']:.0f} bytes")
+        latency = stats["input_latency_ms"]
+        if latency is not None:
+            print(f"  input latency p50 {latency['p50']:.1f}ms p99 {latency['p99']:.1f}ms "
+                  f"({peer.input_delay} tick input delay, {stats['stalls']} stalls)")
+        if stats["desync_ticks"] or stats["corrections"]:
+            print(f"  desyncs at ticks {stats['desync_ticks']}, {stats['corrections']} corrected from snapshots")
+
+
+if __name__ == '__main__':
+    main()
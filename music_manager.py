@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+import pyglet
+from asset_pack import load_media
+from variables import *
+
+
+def music_file_name(level):
+    return f"music/music_{level}.mp3"
+
+
+def decode_track(file_name):
+    # Fully decoded up front, so looping it never waits on the decoder
+    try:
+        return load_media(file_name)
+    except Exception as e:
+        print(f"Unable to load {file_name}.", e)
+        return None
+
+
+class MusicManager:
+    def __init__(self, volume: float = MUSIC_VOLUME, crossfade_time: float = MUSIC_CROSSFADE_TIME):
+        self.volume = volume
+        self.crossfade_time = crossfade_time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.tracks = {}
+        self.current_file = None
+        self.next_file = None
+        self.player = None
+        self.fading_out = []
+        self.fade_elapsed = 0
+        self.fading = False
+        self.waiting = False
+
+    def prefetch(self, file_name):
+        self.next_file = file_name
+        self.decode(file_name)
+
+    def decode(self, file_name):
+        if file_name not in self.tracks:
+            self.tracks[file_name] = self.executor.submit(decode_track, file_name)
+        # A decoded track is several megabytes, so only the playing one and the next one are kept
+        keep = (self.current_file, self.next_file)
+        for old_file in [old_file for old_file in self.tracks if old_file not in keep]:
+            self.tracks.pop(old_file).cancel()
+
+    def is_ready(self, file_name):
+        future = self.tracks.get(file_name)
+        return future is not None and future.done()
+
+    def duration(self, file_name):
+        if not self.is_ready(file_name):
+            return None
+        source = self.tracks[file_name].result()
+        return source.duration if source is not None else None
+
+    def play(self, file_name):
+        if file_name == self.current_file:
+            return
+        self.current_file = file_name
+        self.decode(file_name)
+        # The main thread polls for the decode to finish; pyglet's clock can't be touched from the worker
+        if not self.waiting:
+            self.waiting = True
+            pyglet.clock.schedule_interval(self.check_track, MUSIC_READY_INTERVAL)
+
+    def check_track(self, delta_time):
+        if self.current_file is not None and not self.is_ready(self.current_file):
+            return
+        self.waiting = False
+        pyglet.clock.unschedule(self.check_track)
+        if self.current_file is not None:
+            self.start_track(self.current_file)
+
+    def start_track(self, file_name):
+        source = self.tracks[file_name].result()
+        if source is None:
+            return
+        player = pyglet.media.Player()
+        player.queue(source)
+        player.loop = True
+
+        if self.player is None:
+            player.volume = self.volume
+        else:
+            player.volume = 0
+            self.fading_out.append(self.player)
+            self.start_fade()
+        player.play()
+        self.player = player
+
+    def start_fade(self):
+        self.fade_elapsed = 0
+        if not self.fading:
+            self.fading = True
+            pyglet.clock.schedule_interval(self.fade, MUSIC_FADE_INTERVAL)
+
+    def fade(self, delta_time):
+        self.fade_elapsed += delta_time
+        progress = min(self.fade_elapsed / self.crossfade_time, 1)
+        self.player.volume = self.volume * progress
+        for player in self.fading_out:
+            player.volume = min(player.volume, self.volume * (1 - progress))
+        if progress < 1:
+            return
+        for player in self.fading_out:
+            player.pause()
+            player.delete()
+        self.fading_out.clear()
+        self.fading = False
+        pyglet.clock.unschedule(self.fade)
+
+    def stop(self):
+        if self.waiting:
+            self.waiting = False
+            pyglet.clock.unschedule(self.check_track)
+        if self.fading:
+            self.fading = False
+            pyglet.clock.unschedule(self.fade)
+        for player in self.fading_out + [self.player]:
+            if player is not None:
+                player.pause()
+                player.delete()
+        self.fading_out.clear()
+        self.player = None
+        self.current_file = None
+
+    def shutdown(self):
+        self.stop()
+        self.executor.shutdown(wait=False)
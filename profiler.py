@@ -0,0 +1,93 @@
+import csv
+import json
+import timeit
+import numpy as np
+from variables import *
+
+SPAN_NAMES = ["physics_engine.update", "update_player", "update_view_port", "update_bullets", "update_enemies",
+              "draw background", "draw background_list", "draw wall_list", "draw coin_list",
+              "draw dont_touch_list", "draw enemy_list", "draw bullet_list", "draw player_list",
+              "draw foreground_list", "draw hud"]
+
+
+class FrameProfiler:
+    def __init__(self, span_names=SPAN_NAMES, capacity: int = PROFILER_FRAMES):
+        self.span_names = list(span_names)
+        self.span_index = {name: i for i, name in enumerate(self.span_names)}
+        self.capacity = capacity
+        # One row per frame, one column per span, in milliseconds; allocated once
+        self.samples = np.zeros((capacity, len(self.span_names)))
+        self.current = [0.0] * len(self.span_names)
+        self.position = 0
+        self.frames = 0
+        self.enabled = False
+
+    def start(self):
+        if not self.enabled:
+            return 0.0
+        return timeit.default_timer()
+
+    def stop(self, name, start):
+        if not self.enabled:
+            return
+        self.current[self.span_index[name]] += timeit.default_timer() - start
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        row = self.samples[self.position]
+        row[:] = self.current
+        row *= 1000
+        self.current = [0.0] * len(self.span_names)
+        self.position = (self.position + 1) % self.capacity
+        self.frames += 1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current = [0.0] * len(self.span_names)
+
+    def reset(self):
+        self.samples.fill(0)
+        self.current = [0.0] * len(self.span_names)
+        self.position = 0
+        self.frames = 0
+
+    def recorded(self):
+        # Oldest frame first
+        if self.frames < self.capacity:
+            return self.samples[:self.frames]
+        return np.roll(self.samples, -self.position, axis=0)
+
+    def percentiles(self):
+        recorded = self.recorded()
+        if not len(recorded):
+            return {}
+        p50, p95, p99 = np.percentile(recorded, [50, 95, 99], axis=0)
+        total = np.percentile(recorded.sum(axis=1), [50, 95, 99])
+        stats = {name: (p50[i], p95[i], p99[i]) for i, name in enumerate(self.span_names)}
+        stats["total"] = tuple(total)
+        return stats
+
+    def dump_csv(self, file_name):
+        with open(file_name, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame"] + self.span_names)
+            first_frame = self.frames - len(self.recorded())
+            for i, row in enumerate(self.recorded().tolist()):
+                writer.writerow([first_frame + i] + row)
+
+    def dump_json(self, file_name):
+        stats = self.percentiles()
+        with open(file_name, "w") as file:
+            json.dump({"frames": self.frames,
+                       "spans": self.span_names,
+                       "percentiles_ms": {name: dict(zip(("p50", "p95", "p99"), map(float, values)))
+                                          for name, values in stats.items()},
+                       "samples_ms": self.recorded().tolist()}, file, indent=2)
+
+    def dump(self, base_name=PROFILER_FILE_NAME):
+        self.dump_csv(base_name + ".csv")
+        self.dump_json(base_name + ".json")
+
+
+profiler = FrameProfiler()
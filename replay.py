@@ -0,0 +1,166 @@
+import argparse
+import os
+import random
+import struct
+import timeit
+import zlib
+from array import array
+from simulation import World, create_headless_world, run_walker
+from texture_cache import set_headless
+from level_loader import LevelLoader
+from commands import COMMAND_TYPES
+from variables import *
+
+# magic, level, seed, input count, tick count
+REPLAY_HEADER = struct.Struct("<4sIIII")
+# tick, command code
+REPLAY_INPUT = struct.Struct("<IB")
+
+
+def state_checksum(world):
+    player = world.player
+    state = struct.pack("<IId4di", world.level, world.score, world.view_left,
+                        player.center_x, player.center_y, player.change_x, player.change_y,
+                        player.state)
+    checksum = zlib.crc32(state)
+    bullets = array("d")
+    for bullet in world.bullet_list:
+        bullets.append(bullet.center_x)
+        bullets.append(bullet.center_y)
+    checksum = zlib.crc32(bullets.tobytes(), checksum)
+    swarm = world.enemy_swarm
+    checksum = zlib.crc32(swarm.x.tobytes(), checksum)
+    checksum = zlib.crc32(swarm.alive.tobytes(), checksum)
+    return zlib.crc32(struct.pack("<I", len(world.coin_index)), checksum)
+
+
+class Recording:
+    def __init__(self, level=1, seed=REPLAY_SEED):
+        self.level = level
+        self.seed = seed
+        self.inputs = []
+        self.checksums = array("I")
+
+    @property
+    def tick_count(self):
+        return len(self.checksums)
+
+    def save(self, file_name):
+        with open(file_name, "wb") as file:
+            file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, self.level, self.seed,
+                                          len(self.inputs), len(self.checksums)))
+            for tick, code in self.inputs:
+                file.write(REPLAY_INPUT.pack(tick, code))
+            file.write(self.checksums.tobytes())
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, "rb") as file:
+            data = file.read()
+        magic, level, seed, input_count, tick_count = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError(f"{file_name} is not a replay file")
+        recording = cls(level, seed)
+        offset = REPLAY_HEADER.size
+        recording.inputs = list(REPLAY_INPUT.iter_unpack(data[offset:offset + input_count * REPLAY_INPUT.size]))
+        offset += input_count * REPLAY_INPUT.size
+        recording.checksums.frombytes(data[offset:offset + tick_count * recording.checksums.itemsize])
+        return recording
+
+
+class InputRecorder:
+    def __init__(self, world, seed=REPLAY_SEED):
+        # Ticks are stored relative to the start, so a replay can begin from a fresh world
+        self.world = world
+        self.start_tick = world.tick
+        self.recording = Recording(world.level, seed)
+        random.seed(seed)
+
+    def record(self, command):
+        self.recording.inputs.append((self.world.tick - self.start_tick, command.code))
+
+    def record_tick(self):
+        self.recording.checksums.append(state_checksum(self.world))
+
+    def execute(self, command):
+        self.record(command)
+        self.world.execute(command)
+
+    def step(self):
+        self.world.step()
+        self.record_tick()
+
+    def drain_events(self):
+        return self.world.drain_events()
+
+    @property
+    def completed(self):
+        return self.world.completed
+
+    def save(self, file_name):
+        self.recording.save(file_name)
+
+
+class ReplayDriver:
+    def __init__(self, recording, world):
+        self.recording = recording
+        self.world = world
+        self.tick = 0
+        self.next_input = 0
+        self.diverged_tick = None
+        self.commands = {code: command_type() for code, command_type in COMMAND_TYPES.items()}
+        random.seed(recording.seed)
+        world.setup(recording.level)
+
+    @property
+    def finished(self):
+        return self.tick >= self.recording.tick_count
+
+    def step(self):
+        inputs = self.recording.inputs
+        while self.next_input < len(inputs) and inputs[self.next_input][0] <= self.tick:
+            self.world.execute(self.commands[inputs[self.next_input][1]])
+            self.next_input += 1
+        self.world.step()
+        if self.diverged_tick is None and state_checksum(self.world) != self.recording.checksums[self.tick]:
+            self.diverged_tick = self.tick
+        self.tick += 1
+
+    def run(self):
+        while not self.finished:
+            self.step()
+        return self.diverged_tick
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Record or replay a headless run of the game.")
+    parser.add_argument("file_name")
+    parser.add_argument("--record", action="store_true",
+                        help="record a scripted walk instead of replaying the file")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=3000)
+    args = parser.parse_args()
+
+    if args.record:
+        recorder = InputRecorder(create_headless_world(args.level))
+        run_walker(recorder, args.ticks)
+        recorder.save(args.file_name)
+        print(f"Recorded {recorder.recording.tick_count} ticks, {len(recorder.recording.inputs)} inputs")
+        return
+
+    recording = Recording.load(args.file_name)
+    set_headless()
+    driver = ReplayDriver(recording, World(LevelLoader(with_assets=False)))
+    start_time = timeit.default_timer()
+    diverged_tick = driver.run()
+    total_time = timeit.default_timer() - start_time
+    print(f"Replayed {driver.tick} ticks in {total_time:.3f}s ({driver.tick / total_time:.0f} ticks/s)")
+    if diverged_tick is None:
+        print("No divergence")
+    else:
+        print(f"Diverged at tick {diverged_tick}")
+
+
+if __name__ == '__main__':
+    main()
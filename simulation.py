@@ -0,0 +1,316 @@
+import argparse
+import os
+import timeit
+import pyglet
+
+# Stepping the world never needs a GL context, so keep pyglet from creating its hidden window
+pyglet.options["shadow_window"] = False
+
+import arcade
+from player import Player
+from texture_cache import load_frames, set_headless
+from level_loader import LevelLoader, map_file_name
+from broadphase import SweepAndPrune
+from tile_physics import TileGrid, TilePhysicsEngine
+from level_snapshot import LevelSnapshot
+from profiler import profiler
+from commands import *
+from variables import *
+
+
+class World:
+    def __init__(self, level_loader=None):
+        if level_loader is None:
+            level_loader = LevelLoader(with_assets=False)
+        self.level_loader = level_loader
+        self.loaded_level = None
+        self.level = 1
+        self.score = 0
+        self.tick = 0
+        self.end_of_map = 0
+        self.completed = False
+        self.events = []
+
+        self.coin_list = None
+        self.wall_list = None
+        self.foreground_list = None
+        self.background_list = None
+        self.dont_touch_list = None
+        self.player_list = None
+        self.bullet_list = None
+        self.enemy_list = None
+        self.flag_list = None
+        self.coin_index = None
+        self.dont_touch_index = None
+        self.background_chunks = None
+        self.wall_chunks = None
+        self.coin_chunks = None
+        self.dont_touch_chunks = None
+        self.foreground_chunks = None
+        self.enemy_swarm = None
+        self.player = None
+        self.players = []
+
+        self.physics_engine = None
+        self.enemy_broadphase = SweepAndPrune()
+        self.view_left = 0
+        self.view_bottom = 0
+        self.viewport_changed = False
+
+    def setup(self, level):
+        self.level = level
+        self.loaded_level = self.level_loader.take(level)
+        loaded_level = self.loaded_level
+        if loaded_level.snapshot is None:
+            loaded_level.snapshot = LevelSnapshot(loaded_level)
+        if loaded_level.tile_grid is None:
+            loaded_level.tile_grid = TileGrid(loaded_level.my_map)
+        self.start_level()
+
+    def restart(self):
+        # Back to the start of the current level from its snapshot, without loading anything
+        self.loaded_level.snapshot.restore(self.loaded_level)
+        self.completed = False
+        self.start_level()
+
+    def start_level(self):
+        self.view_bottom = 0
+        self.view_left = 0
+        self.score = 0
+        self.end_of_map = self.loaded_level.end_of_map
+        self.setup_lists(self.loaded_level)
+        self.setup_player()
+
+    def setup_lists(self, loaded_level):
+        self.player_list = arcade.SpriteList()
+        self.coin_list = loaded_level.coin_list
+        self.wall_list = loaded_level.wall_list
+        self.dont_touch_list = loaded_level.dont_touch_list
+        self.foreground_list = loaded_level.foreground_list
+        self.background_list = loaded_level.background_list
+        self.enemy_list = loaded_level.enemy_list
+        self.flag_list = loaded_level.flag_list
+        self.coin_index = loaded_level.coin_index
+        self.dont_touch_index = loaded_level.dont_touch_index
+        self.background_chunks = loaded_level.background_chunks
+        self.wall_chunks = loaded_level.wall_chunks
+        self.coin_chunks = loaded_level.coin_chunks
+        self.dont_touch_chunks = loaded_level.dont_touch_chunks
+        self.foreground_chunks = loaded_level.foreground_chunks
+        self.enemy_swarm = loaded_level.enemy_swarm
+
+    def setup_player(self):
+        self.player = self.create_player()
+        self.players = [self.player]
+        self.physics_engine = self.player.physics_engine
+        self.bullet_list = self.player.bullet_list
+
+    def create_player(self):
+        player = Player()
+        player.stand_right_textures = load_frames(PLAYER_STAND_FRAMES, CHARACTER_SCALING)
+        player.stand_left_textures = load_frames(PLAYER_STAND_FRAMES, CHARACTER_SCALING, mirrored=True)
+        player.walk_right_textures = load_frames(PLAYER_WALK_FRAMES, CHARACTER_SCALING)
+        player.walk_left_textures = load_frames(PLAYER_WALK_FRAMES, CHARACTER_SCALING, mirrored=True)
+
+        player.texture_change_distance = 25
+        player.center_x = PLAYER_START_X
+        player.center_y = PLAYER_START_Y
+        player.scale = CHARACTER_SCALING
+        player.physics_engine = TilePhysicsEngine(player, self.loaded_level.tile_grid, GRAVITY)
+        player.events = self.events
+        self.player_list.append(player)
+        return player
+
+    def execute(self, command):
+        command.execute(self.player)
+
+    def drain_events(self):
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def step(self):
+        if self.completed:
+            return
+        start = profiler.start()
+        self.physics_engine.update()
+        profiler.stop("physics_engine.update", start)
+
+        start = profiler.start()
+        level = self.level
+        self.enemy_broadphase.build(self.enemy_list)
+        changed_viewport = self.update_player()
+        if self.level != level:
+            # Reaching the end of the map loaded the next level, whose zombies the bullets are tested against
+            self.enemy_broadphase.build(self.enemy_list)
+        profiler.stop("update_player", start)
+
+        start = profiler.start()
+        self.update_view_port(changed_viewport)
+        self.update_stream()
+        profiler.stop("update_view_port", start)
+
+        start = profiler.start()
+        self.update_bullets()
+        profiler.stop("update_bullets", start)
+
+        start = profiler.start()
+        self.update_enemies()
+        profiler.stop("update_enemies", start)
+        self.tick += 1
+
+    def update_player(self):
+        self.player_list.update_animation()
+        self.collect_coins(self.player)
+
+        enemy_player_hitlist = self.enemy_broadphase.query(self.player)
+        if len(enemy_player_hitlist) > 0:
+            self.player.center_x = PLAYER_START_X
+            self.player.center_y = PLAYER_START_Y
+            self.events.append(GAME_OVER_EVENT)
+
+        changed_viewport = False
+
+        if self.player.center_y < 100:
+            self.player.center_x = PLAYER_START_X
+            self.player.center_Y = PLAYER_START_Y
+
+            self.view_left = 0
+            self.view_bottom = 0
+            changed_viewport = True
+
+            self.events.append(GAME_OVER_EVENT)
+
+        if self.dont_touch_index.check_for_collision(self.player):
+            self.player.center_x = PLAYER_START_X
+            self.player.center_y = PLAYER_START_Y
+
+            # Set the camera to the start
+            self.view_left = 0
+            self.view_bottom = 0
+            changed_viewport = True
+            self.events.append(GAME_OVER_EVENT)
+
+        if self.player.center_x >= self.end_of_map * PREFETCH_FRACTION:
+            self.level_loader.prefetch(self.level + 1)
+
+        if self.player.center_x >= self.end_of_map:
+            if not os.path.exists(map_file_name(self.level + 1)):
+                self.completed = True
+                return changed_viewport
+            self.setup(self.level + 1)
+            self.events.append(LEVEL_EVENT)
+            changed_viewport = True
+        return changed_viewport
+
+    def collect_coins(self, player):
+        coin_hitlist = self.coin_index.check_for_collision(player)
+        for coin in coin_hitlist:
+            coin.kill()
+            self.coin_index.remove(coin)
+            self.events.append(COIN_EVENT)
+            self.score += 1
+
+    def update_bullets(self):
+        bullet_pool = self.player.bullet_pool
+        bullet_pool.update(self.view_left, self.view_left + SCREEN_WIDTH)
+        enemy_bullet_hits = {}
+        for bullet, enemy in self.enemy_broadphase.pairs(self.bullet_list):
+            enemy_bullet_hits.setdefault(bullet, []).append(enemy)
+
+        killed_enemies = set()
+        for bullet, enemy_bullet_hitlist in enemy_bullet_hits.items():
+            # A zombie already shot this frame doesn't stop later bullets
+            enemy_bullet_hitlist = [enemy for enemy in enemy_bullet_hitlist if enemy not in killed_enemies]
+            if len(enemy_bullet_hitlist) > 0:
+                bullet_pool.release(bullet)
+
+            for enemy in enemy_bullet_hitlist:
+                killed_enemies.add(enemy)
+                enemy.kill()
+                self.enemy_swarm.remove(enemy)
+                self.score += 100
+                self.events.append(HIT_EVENT)
+
+    def update_stream(self):
+        stream = self.loaded_level.stream
+        if stream is not None and stream.update(self.view_left, self.view_left + SCREEN_WIDTH):
+            self.enemy_swarm = self.loaded_level.enemy_swarm
+            self.loaded_level.tile_grid.prune(*stream.loaded_columns())
+
+    def update_enemies(self):
+        self.enemy_swarm.update(self.view_left, self.view_left + SCREEN_WIDTH)
+
+    def update_view_port(self, changed_viewport):
+        left_boundary = self.view_left + LEFT_VIEWPORT_MARGIN
+        if self.player.left < left_boundary:
+            self.view_left -= left_boundary - self.player.left
+            changed_viewport = True
+
+        right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_VIEWPORT_MARGIN
+        if self.player.right > right_boundary:
+            self.view_left += self.player.right - right_boundary
+            changed_viewport = True
+
+        top_boundary = self.view_bottom + SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
+        if self.player.top > top_boundary:
+            self.view_bottom += self.player.top - top_boundary
+            changed_viewport = True
+
+        bottom_boundary = self.view_bottom + BOTTOM_VIEWPORT_MARGIN
+        if self.player.bottom < bottom_boundary:
+            self.view_bottom -= bottom_boundary - self.player.bottom
+            changed_viewport = True
+
+        if changed_viewport:
+            self.view_bottom = int(self.view_bottom)
+            self.view_left = int(self.view_left)
+        self.viewport_changed = changed_viewport
+
+
+def create_headless_world(level=1):
+    set_headless()
+    world = World(LevelLoader(with_assets=False))
+    world.setup(level)
+    return world
+
+
+def run_walker(world, ticks):
+    walk_right = WalkRightCommand()
+    jump = JumpCommand()
+    shoot = ShootCommand()
+    world.execute(walk_right)
+    for tick in range(ticks):
+        if world.completed:
+            break
+        if tick % 30 == 0:
+            world.execute(jump)
+        if tick % 20 == 0:
+            world.execute(shoot)
+        world.step()
+        world.drain_events()
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Run the game world without a window.")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=1, help="play the level this many times, restarting in between")
+    args = parser.parse_args()
+
+    world = create_headless_world(args.level)
+    for run in range(args.runs):
+        if run > 0:
+            start_time = timeit.default_timer()
+            world.restart()
+            print(f"Restarted level {world.level} in {(timeit.default_timer() - start_time) * 1000:.2f}ms")
+        start_time = timeit.default_timer()
+        run_walker(world, args.ticks)
+        total_time = timeit.default_timer() - start_time
+        print(f"{args.ticks} ticks in {total_time:.3f}s ({args.ticks / total_time:.0f} ticks/s), "
+              f"level {world.level}, score {world.score}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from asset_pack import load_media
+from variables import *
+
+# Decoded once per process, however many banks or players ask for them
+sources = {}
+
+
+def load_source(file_name):
+    source = sources.get(file_name)
+    if source is None:
+        try:
+            source = sources[file_name] = load_media(file_name)
+        except Exception as e:
+            print(f"Unable to load {file_name}.", e)
+    return source
+
+
+class SoundBank:
+    def __init__(self, sound_files=SOUND_EFFECTS, dedupe_window: float = SOUND_DEDUPE_WINDOW,
+                 voice_limit: int = SOUND_VOICE_LIMIT, global_voice_limit: int = SOUND_GLOBAL_VOICE_LIMIT):
+        self.sound_files = dict(sound_files)
+        self.dedupe_window = dedupe_window
+        self.voice_limit = voice_limit
+        self.global_voice_limit = global_voice_limit
+        self.queued = []
+        self.last_played = {}
+        # Per sound, the end times of the voices still playing
+        self.voices = {name: [] for name in self.sound_files}
+        self.played = 0
+        self.dropped = 0
+        # Effects decode in the background; one asked for before it is ready is skipped, not waited on
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        for file_name in self.sound_files.values():
+            self.executor.submit(load_source, file_name)
+
+    def queue(self, name):
+        if name not in self.queued:
+            self.queued.append(name)
+        else:
+            self.dropped += 1
+
+    def voice_count(self):
+        return sum(len(voices) for voices in self.voices.values())
+
+    def flush(self, now=None):
+        if now is None:
+            now = timeit.default_timer()
+        for name, voices in self.voices.items():
+            voices[:] = [end_time for end_time in voices if end_time > now]
+
+        for name in self.queued:
+            source = sources.get(self.sound_files[name])
+            voices = self.voices[name]
+            if source is None or now - self.last_played.get(name, -self.dedupe_window) < self.dedupe_window \
+                    or len(voices) >= self.voice_limit or self.voice_count() >= self.global_voice_limit:
+                self.dropped += 1
+                continue
+            source.play()
+            voices.append(now + source.duration)
+            self.last_played[name] = now
+            self.played += 1
+        self.queued.clear()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return {"voices": self.voice_count(), "played": self.played, "dropped": self.dropped}
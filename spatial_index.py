@@ -0,0 +1,57 @@
+import math
+import arcade
+from variables import *
+
+
+class SpatialIndex:
+    def __init__(self, sprite_list=None, cell_size: float = GRID_PIXEL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.sprite_cells = {}
+        if sprite_list is not None:
+            for sprite in sprite_list:
+                self.add(sprite)
+
+    def cell_keys(self, left, right, bottom, top):
+        size = self.cell_size
+        min_x = math.floor(left / size)
+        max_x = math.floor(right / size)
+        min_y = math.floor(bottom / size)
+        max_y = math.floor(top / size)
+        return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+    def add(self, sprite):
+        keys = self.cell_keys(sprite.left, sprite.right, sprite.bottom, sprite.top)
+        for key in keys:
+            self.cells.setdefault(key, []).append(sprite)
+        self.sprite_cells[sprite] = keys
+
+    def remove(self, sprite):
+        keys = self.sprite_cells.pop(sprite, None)
+        if keys is None:
+            return
+        for key in keys:
+            bucket = self.cells[key]
+            bucket.remove(sprite)
+            if not bucket:
+                del self.cells[key]
+
+    def query(self, left, right, bottom, top):
+        found = {}
+        for key in self.cell_keys(left, right, bottom, top):
+            bucket = self.cells.get(key)
+            if bucket:
+                for sprite in bucket:
+                    found[sprite] = True
+        return list(found)
+
+    def check_for_collision(self, sprite):
+        candidates = self.query(sprite.left, sprite.right, sprite.bottom, sprite.top)
+        return [other for other in candidates
+                if other is not sprite and arcade.check_for_collision(sprite, other)]
+
+    def __len__(self):
+        return len(self.sprite_cells)
+
+    def __contains__(self, sprite):
+        return sprite in self.sprite_cells
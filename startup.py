@@ -0,0 +1,34 @@
+import json
+import timeit
+
+
+class StartupTimeline:
+    def __init__(self):
+        # Created on the first import, before arcade, so the import time counts
+        self.start_time = timeit.default_timer()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, timeit.default_timer() - self.start_time))
+
+    def elapsed(self, name):
+        for mark_name, elapsed in self.marks:
+            if mark_name == name:
+                return elapsed
+        return None
+
+    def report(self):
+        lines = ["Startup timeline:"]
+        previous = 0.0
+        for name, elapsed in self.marks:
+            lines.append(f"  {name:<24} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)")
+            previous = elapsed
+        return "\n".join(lines)
+
+    def dump_json(self, file_name):
+        with open(file_name, "w") as file:
+            json.dump({"marks_ms": [{"name": name, "elapsed": elapsed * 1000} for name, elapsed in self.marks]},
+                      file, indent=2)
+
+
+timeline = StartupTimeline()
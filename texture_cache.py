@@ -0,0 +1,86 @@
+import threading
+import arcade
+import PIL.Image
+import PIL.ImageOps
+from asset_pack import open_asset, is_packed
+
+
+class TextureCache:
+    def __init__(self):
+        self.textures = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.headless = False
+
+    def load(self, file_name: str, scale: float = 1, mirrored: bool = False):
+        key = (file_name, scale, mirrored)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            return texture
+        # Levels are prefetched on a worker thread, so misses are resolved under the lock
+        with self.lock:
+            texture = self.textures.get(key)
+            if texture is None:
+                self.misses += 1
+                if self.headless:
+                    texture = self.load_size_only(file_name, scale, mirrored)
+                elif is_packed(file_name):
+                    texture = self.load_packed(file_name, scale, mirrored)
+                else:
+                    texture = arcade.load_texture(file_name, scale=scale, mirrored=mirrored)
+                self.textures[key] = texture
+            return texture
+
+    def load_size_only(self, file_name, scale, mirrored):
+        # Opening an image only reads its header, so sprites get their real size without any decoding
+        with PIL.Image.open(open_asset(file_name)) as image:
+            width, height = image.size
+        texture = arcade.Texture(f"{file_name}{scale}{mirrored}")
+        texture.width = width
+        texture.height = height
+        texture.scale = scale
+        return texture
+
+    def load_packed(self, file_name, scale, mirrored):
+        # Same result and texture name as arcade.load_texture, read from the asset pack
+        image = PIL.Image.open(open_asset(file_name))
+        if mirrored:
+            image = PIL.ImageOps.mirror(image)
+        texture = arcade.Texture(f"{file_name}0000{scale}False{mirrored}", image)
+        texture.scale = scale
+        return texture
+
+    def load_frames(self, file_names, scale: float = 1, mirrored: bool = False):
+        return [self.load(file_name, scale, mirrored) for file_name in file_names]
+
+    def texture_bytes(self):
+        return sum(texture.width * texture.height * 4 for texture in self.textures.values())
+
+    def stats(self):
+        return {"textures": len(self.textures),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": self.texture_bytes()}
+
+    def clear(self):
+        self.textures = {}
+        self.hits = 0
+        self.misses = 0
+
+
+texture_cache = TextureCache()
+
+
+def set_headless(headless: bool = True):
+    texture_cache.clear()
+    texture_cache.headless = headless
+
+
+def load_texture(file_name: str, scale: float = 1, mirrored: bool = False):
+    return texture_cache.load(file_name, scale, mirrored)
+
+
+def load_frames(file_names, scale: float = 1, mirrored: bool = False):
+    return texture_cache.load_frames(file_names, scale, mirrored)
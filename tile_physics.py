@@ -0,0 +1,132 @@
+import math
+import arcade
+import numpy as np
+from level_cache import tile_sprites
+from texture_cache import texture_cache
+from variables import *
+
+
+class TileGrid:
+    def __init__(self, compiled, layer_name=PLATFORMS_LAYER, scaling=TILE_SCALING):
+        self.compiled = compiled
+        self.layer_name = layer_name
+        self.scaling = scaling
+        self.rows, self.cols = compiled.layers_int_data[layer_name].shape
+        self.tile_width = compiled.tilewidth * scaling
+        self.tile_height = compiled.tileheight * scaling
+
+        # Position of each cell's tile in the layer's tile arrays, -1 where the cell is empty
+        cols, rows, gids = compiled.tiles[layer_name]
+        self.tile_index = np.full((self.rows, self.cols), -1, dtype=np.int32)
+        self.tile_index[rows, cols] = np.arange(len(gids))
+        self.sprites = {}
+
+        # Tiles hang left and down from their cell's corner, so big tiles reach into neighbouring cells
+        self.reach_x = self.tile_width
+        self.reach_y = self.tile_height
+        for gid in np.unique(gids).tolist():
+            tile = compiled.global_tile_set.get(str(gid))
+            if tile is not None:
+                texture = texture_cache.load(tile.source, scaling)
+                self.reach_x = max(self.reach_x, texture.width * scaling)
+                self.reach_y = max(self.reach_y, texture.height * scaling)
+
+    def sprite(self, row, col):
+        # Built the same way as the level's own wall sprites, the first time the player gets near it
+        sprite = self.sprites.get((row, col))
+        if sprite is None:
+            index = int(self.tile_index[row, col])
+            sprites = tile_sprites(self.compiled, self.layer_name, self.scaling, np.array([index]))
+            sprite = sprites[0] if sprites else False
+            self.sprites[(row, col)] = sprite
+        return sprite
+
+    def sprites_near(self, sprite):
+        # Cells whose tile could touch the sprite's bounding box, in the same row major order as the
+        # layer's sprite list
+        left = sprite.left
+        right = sprite.right
+        first_col = max(math.ceil(left / self.tile_width), 0)
+        last_col = min(math.floor((right + self.reach_x) / self.tile_width), self.cols - 1)
+        first_row = max(math.ceil(self.rows - (sprite.top + self.reach_y) / self.tile_height), 0)
+        last_row = min(math.floor(self.rows - sprite.bottom / self.tile_height), self.rows - 1)
+        window = self.tile_index[first_row:last_row + 1, first_col:last_col + 1].tolist()
+        near = []
+        for row, indexes in enumerate(window, first_row):
+            for col, index in enumerate(indexes, first_col):
+                if index >= 0:
+                    tile = self.sprite(row, col)
+                    if tile:
+                        near.append(tile)
+        return near
+
+    def prune(self, first_col, last_col):
+        # Sprites away from the streamed in part of the level are dropped, and built again if the player
+        # gets back to them
+        self.sprites = {(row, col): sprite for (row, col), sprite in self.sprites.items()
+                        if first_col <= col <= last_col}
+
+    def check_for_collision(self, sprite):
+        return [tile for tile in self.sprites_near(sprite) if arcade.check_for_collision(sprite, tile)]
+
+
+class TilePhysicsEngine:
+    # arcade.PhysicsEnginePlatformer's update and can_jump, checked against the few platform tiles
+    # around the player instead of the whole wall list. Level tiles never move, so the moving
+    # platform pass is left out
+    def __init__(self, player_sprite, grid, gravity_constant=GRAVITY):
+        self.player_sprite = player_sprite
+        self.grid = grid
+        self.gravity_constant = gravity_constant
+
+    def can_jump(self):
+        self.player_sprite.center_y -= 2
+        hit_list = self.grid.check_for_collision(self.player_sprite)
+        self.player_sprite.center_y += 2
+        return len(hit_list) > 0
+
+    def update(self):
+        player = self.player_sprite
+        grid = self.grid
+
+        player.change_y -= self.gravity_constant
+        player.center_y += player.change_y
+
+        hit_list = grid.check_for_collision(player)
+        if len(hit_list) > 0:
+            if player.change_y > 0:
+                for item in hit_list:
+                    player.top = min(item.bottom, player.top)
+            elif player.change_y < 0:
+                for item in hit_list:
+                    while arcade.check_for_collision(player, item):
+                        player.bottom += 0.25
+            player.change_y = min(0.0, hit_list[0].change_y)
+
+        player.center_y = round(player.center_y, 2)
+
+        player.center_x += player.change_x
+
+        check_again = True
+        while check_again:
+            check_again = False
+            hit_list = grid.check_for_collision(player)
+            if len(hit_list) > 0:
+                change_x = player.change_x
+                if change_x > 0:
+                    for item in hit_list:
+                        # Walking into a tile steps up onto it if there is room, like a ramp
+                        player.center_y += change_x
+                        if len(grid.check_for_collision(player)) > 0:
+                            player.center_y -= change_x
+                            player.right = min(item.left, player.right)
+                            check_again = True
+                            break
+                elif change_x < 0:
+                    for item in hit_list:
+                        player.center_y -= change_x
+                        if len(grid.check_for_collision(player)) > 0:
+                            player.center_y += change_x
+                            player.left = max(item.right, player.left)
+                            check_again = True
+                            break
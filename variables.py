@@ -10,9 +10,15 @@ COIN_SCALING = 0.5
 SPRITE_PIXEL_SIZE = 128
 GRID_PIXEL_SIZE = (SPRITE_PIXEL_SIZE * TILE_SCALING)
 
-MOVEMENT_SPEED = 7
-GRAVITY = 1
-JUMP_SPEED = 20
+# Simulation ticks per second; rendering runs at whatever rate the window manages
+SIMULATION_RATE = 60
+MAX_TICKS_PER_FRAME = 5
+# Speeds are per tick and were tuned at 60 ticks per second
+TICK_SCALE = 60 / SIMULATION_RATE
+
+MOVEMENT_SPEED = 7 * TICK_SCALE
+GRAVITY = 1 * TICK_SCALE ** 2
+JUMP_SPEED = 20 * TICK_SCALE
 
 LEFT_VIEWPORT_MARGIN = 300
 RIGHT_VIEWPORT_MARGIN = 300
@@ -22,7 +28,7 @@ BOTTOM_VIEWPORT_MARGIN = 60
 PLAYER_START_X = 128
 PLAYER_START_Y = 128
 
-BULLET_SPEED = 8
+BULLET_SPEED = 8 * TICK_SCALE
 BULLET_SCALE = 0.8
 
 FACE_RIGHT = 1
@@ -31,4 +37,90 @@ FACE_UP = 3
 FACE_DOWN = 4
 
 ENEMY_SCALE = 0.5
-ENEMY_SPEED = 4
+ENEMY_SPEED = 4 * TICK_SCALE
+
+PLAYER_STAND_FRAMES = ["images/player_3/stand/0.png"]
+PLAYER_WALK_FRAMES = [f"images/player_3/walk/{i}.png" for i in range(8)]
+ENEMY_STAND_FRAMES = ["images/zombies/stand/0.png"]
+ENEMY_WALK_FRAMES = [f"images/zombies/walk/{i}.png" for i in range(10)]
+BULLET_IMAGE = "images/items/bullet.png"
+
+PLATFORMS_LAYER = "Platforms"
+COINS_LAYER = "Coins"
+FOREGROUND_LAYER = "Foreground"
+BACKGROUND_LAYER = "Background"
+DONT_TOUCH_LAYER = "Don't Touch"
+FLAGS_LAYER = "Flags"
+ENEMIES_LAYER = "Enemies"
+
+PREFETCH_FRACTION = 0.5
+
+LEVEL_CACHE_DIRECTORY = "level_cache"
+
+BULLET_POOL_CAPACITY = 32
+BULLET_LIFETIME = round(120 / TICK_SCALE)
+
+JUMP_EVENT = "jump"
+SHOOT_EVENT = "shoot"
+COIN_EVENT = "coin"
+HIT_EVENT = "hit"
+GAME_OVER_EVENT = "game_over"
+LEVEL_EVENT = "level"
+
+REPLAY_MAGIC = b"KZR1"
+REPLAY_SEED = 1
+
+PROFILER_FRAMES = 600
+PROFILER_OVERLAY_REFRESH = 0.5
+PROFILER_FILE_NAME = "profile"
+
+HUD_TIMING_REFRESH = 0.5
+
+CHUNK_WIDTH = 640
+
+BAKE_STATIC_LAYERS = True
+
+MUSIC_VOLUME = 1.0
+MUSIC_CROSSFADE_TIME = 2.0
+MUSIC_FADE_INTERVAL = 1 / 30
+MUSIC_READY_INTERVAL = 1 / 20
+
+SOUND_EFFECTS = {COIN_EVENT: "sounds/coin1.wav",
+                 JUMP_EVENT: "sounds/jump1.wav",
+                 GAME_OVER_EVENT: "sounds/gameover1.wav",
+                 SHOOT_EVENT: "sounds/laser1.wav",
+                 HIT_EVENT: "sounds/laser4.wav"}
+SOUND_DEDUPE_WINDOW = 0.05
+SOUND_VOICE_LIMIT = 3
+SOUND_GLOBAL_VOICE_LIMIT = 8
+
+INTERPOLATION_SNAP_DISTANCE = 256
+
+# Zombies this far outside the screen keep walking but aren't animated
+ANIMATION_CULL_MARGIN = 256
+
+# Maps wider than this many tiles are streamed in column chunks instead of loaded whole
+STREAM_MIN_COLUMNS = 256
+STREAM_CHUNK_COLUMNS = 10
+STREAM_MARGIN = SCREEN_WIDTH
+
+START_LEVEL = 1
+STARTUP_REPORT_FILE_NAME = "startup.json"
+
+ASSET_PACK_FILE_NAME = "assets.kzp"
+ASSET_PACK_MAGIC = b"KZP2"
+# Music stays loose: the FFmpeg decoder arcade registers for .mp3 only opens files by path
+ASSET_PACK_SOURCES = ["images/**/*.png", "sounds/*.wav"]
+
+VALIDATION_REPORT_DIRECTORY = "validation"
+
+LOCKSTEP_PORT = 27015
+# Ticks between pressing a key and it taking effect on both machines
+LOCKSTEP_INPUT_DELAY = 3
+LOCKSTEP_HASH_INTERVAL = 15
+LOCKSTEP_SNAPSHOT_INTERVAL = 60
+LOCKSTEP_TIMEOUT = 10.0
+# Snapshot positions are sent in hundredths of a pixel
+LOCKSTEP_POSITION_SCALE = 100
+PARTNER_COLOR = (160, 200, 255)
+LOCKSTEP_MAGIC = b"KZS1"